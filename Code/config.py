@@ -6,9 +6,19 @@ SIMULATIONS = {
             "f0": np.linspace(1.5e9, 3.5e9, 5),
             "freq_range": np.linspace(0.1e9, 67e9, 100),
             "loss": True,
+            "f0_tol": None,  # None uses f0 as given, else relative R/G interpolation tolerance of adaptive f0
+            "f0_max_points": 17,  # upper bound of lossy solves with adaptive f0
+            "interp_R": "sqrt",  # linear, sqrt or proportional
+            "interp_G": "proportional",  # linear, sqrt or proportional
+            "rlgc_model": "interpolate",  # interpolate R/G over f0, or causal (skin effect + Djordjevic-Sarkar; R solved at min/max f0 only, CG once)
+            "modal_solver": "exact",  # exact or perturbation (large lossy MNLIN buses)
+            "workers": 1,  # processes for RLGC->S conversion of large frequency grids
+            "storage": "full",  # full or compact (upper triangle, complex64)
             "sigma": None,
             "seg_cond": 3.0,
             "seg_diel": 1.0,
+            "mesh_tol": None,  # None uses seg_cond/seg_diel as given, else L/C tolerance of the mesh convergence
+            "surrogate_tol": 0.01,  # 2D_Surrogate: largest estimated relative RLGC error answered from the table
             "do_vector_fitting": True,
         }
 }
@@ -47,7 +57,7 @@ STRUCTURES = {
             "W": 10e-6,
             "length": 0.1,
             "SUBSTRATE": "MSUB",
-            "MODELTYPE": "2D_Quasistatic",  # 2D_Quasistatic or Verilog or Subcircuit
+            "MODELTYPE": "2D_Quasistatic",  # 2D_Quasistatic, 2D_Surrogate or Verilog or Subcircuit
             "SIMULATION": "SPARAM",
         },
     "M2LIN":
@@ -57,7 +67,7 @@ STRUCTURES = {
             "S": 30e-6,
             "length": 500.e-6,
             "SUBSTRATE": "MSUB",
-            "MODELTYPE": "2D_Quasistatic",  # 2D_Quasistatic or Verilog or Subcircuit
+            "MODELTYPE": "2D_Quasistatic",  # 2D_Quasistatic, 2D_Surrogate or Verilog or Subcircuit
             "SIMULATION": "SPARAM",
         },
     "MNLIN":
@@ -66,7 +76,7 @@ STRUCTURES = {
             "S": [10.e-6, 10.e-6, 10.e-6, 10.e-6],
             "length": 0.1,
             "SUBSTRATE": "MSUB",
-            "MODELTYPE": "2D_Quasistatic",  # 2D_Quasistatic
+            "MODELTYPE": "2D_Quasistatic",  # 2D_Quasistatic or 2D_Surrogate
             "SIMULATION": "SPARAM",
         },
     "MTEE":
@@ -1,7 +1,13 @@
-from talgat.talgatsession import TalgatSession
+from talgat.talgatsession import session_manager, TimingStats
+from talgat.talgatpool import TalgatPool
+from talgat.rlgccache import RLGCCache, make_key
+from talgat.meshconvergence import MeshConvergence
+from surrogate.surrogate import RLGCSurrogate
+from pipeline import run_pipeline
 from rlcg2s.rlcg2s import RLGC2SConverter
 from vectorfitting.vectorfitting import SParamProcessor
-import tempfile
+import itertools
+import numpy as np
 import os
 import time
 
@@ -17,72 +23,299 @@ class Simulation_Handler():
         self.sim_params = simul
         print("Simulation_Hundler started successfully")
 
-    def run_simulation(self):
-        if self.struct_params["MODELTYPE"] == "2D_Quasistatic":
-            shared_code = open(os.path.join(self.paths["talgat_code"], "shared.py"), encoding="utf-8").read()
-            session = TalgatSession(self.paths["talgat_exe"])
-            script_code = open(os.path.join(self.paths["talgat_code"], f"{self.struct_name}.py"), encoding="utf-8").read()
-            with tempfile.NamedTemporaryFile("w", delete=False, suffix=".py", encoding="utf-8") as tmp:
-                tmp.write(shared_code)
-                shared_path = tmp.name
-
-            session.proc.stdin.write(f"exec(open(r'''{shared_path}''').read())\n")
-            session.proc.stdin.flush()
-
-            params = self.struct_params.copy()
-            params.update(self.subst_params)
-            params.update(self.sim_params)
-            start_talgat = time.time()
-            result = session.run_script(params, script_code)
-            print(f"Completed TALGAT simulation in {time.time() - start_talgat:.2f} sec")
+    def _read_code(self):
+        shared_code = open(os.path.join(self.paths["talgat_code"], "shared.py"), encoding="utf-8").read()
+        script_code = open(os.path.join(self.paths["talgat_code"], f"{self.struct_name}.py"), encoding="utf-8").read()
+        return shared_code, script_code
 
-            if "Z0" not in params.keys():
-                print(f"Warning, can't find Z0 for '{self.struct_name}', using default 50 Ohm")
-                params.update({"Z0":50})
+    def _params(self, overrides=None) -> dict:
+        params = self.struct_params.copy()
+        params.update(self.subst_params)
+        params.update(self.sim_params)
+        params.update(overrides or {})
+        return params
 
-            # Convert RLGC to S-parameters
-            converter = RLGC2SConverter(params, [result])
-            s_params, rlgc_struct = converter.convert()
-            print(f"S-params shape for {self.struct_name}: {s_params.shape}")
+    def _resolve_mesh(self, params: dict, script_code: str, shared_code: str):
+        """Replace seg_cond, seg_diel by the converged segmentation if mesh_tol is set."""
+        if params.get("mesh_tol") is None or not self.paths.get("mesh_records"):
+            return
+        mesh = MeshConvergence(self.paths["mesh_records"], self.subst_params.keys())
+        record = mesh.get(script_code, shared_code, params, tol=params["mesh_tol"])
+        if record is None:
+            session = session_manager.get(self.paths["talgat_exe"], shared_code)
+            record = mesh.converge(session, self.struct_name, params, script_code, shared_code,
+                                   tol=params["mesh_tol"], timeout=self.paths.get("talgat_timeout"))
+        print(f"Using seg_cond={record['seg_cond']:.3g}, seg_diel={record['seg_diel']:.3g} for {self.struct_name}")
+        params.update(seg_cond=record["seg_cond"], seg_diel=record["seg_diel"])
 
-            # converter.save_to_snp(s_params)
+    def _rlgc_cache(self):
+        if not self.paths.get("rlgc_cache"):
+            return None
+        return RLGCCache(self.paths["rlgc_cache"], self.paths.get("rlgc_cache_size", 512 * 2 ** 20))
 
+    def _solve(self, params: dict, script_code: str, shared_code: str, pool=None) -> dict:
+        """TALGAT result for one parameter set, from the RLGC cache if possible.
 
+        The solve runs on pool (a TalgatPool) if given, else on the shared warm session."""
+        cache = self._rlgc_cache()
+        if cache is not None:
+            cache_key = make_key(script_code, shared_code, params)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                print(f"Using cached TALGAT result for {self.struct_name}")
+                return {"params": params, "result": cached}
 
-            # Create SParamProcessor
-            processor = SParamProcessor(
-                s_params=s_params,
-                freqs=self.sim_params['freq_range'],
-                z0=params['Z0'],
-                name=f"{self.struct_name}"
-            )
+        start_talgat = time.time()
+        if pool is not None:
+            result = pool.run(params, script_code, timeout=self.paths.get("talgat_timeout"))
         else:
-            raise NotImplementedError(f'Model type "{self.struct_params["MODELTYPE"]}" for "{self.struct_name}" not implemented yet')
+            # One warm session is reused by every Simulation_Handler with the same executable
+            session = session_manager.get(self.paths["talgat_exe"], shared_code)
+            result = session.run_script(params, script_code, timeout=self.paths.get("talgat_timeout"))
+        print(f"Completed TALGAT simulation in {time.time() - start_talgat:.2f} sec")
+        if "error" in result:
+            raise RuntimeError(f"TALGAT simulation of '{self.struct_name}' failed: {result['error']}")
+        if "timings" in result["result"]:
+            run_timings = TimingStats()
+            run_timings.add(result["result"]["timings"], time.time() - start_talgat)
+            print(run_timings.report())
+        if cache is not None:
+            cache.put(cache_key, result["result"])
+        return result
+
+    def _surrogate_path(self) -> str:
+        return os.path.join(self.paths["surrogates"], f"{self.struct_name}_{self.struct_params['SUBSTRATE']}.npz")
+
+    def build_surrogate(self, ranges: dict, n_samples: int = 64, pool_size: int = 1, batch_size: int = 8):
+        """
+        Build and store the RLGC surrogate table of this structure and substrate.
+
+        Args:
+            ranges (dict): Varied parameter name -> (low, high), e.g. {"W": (5e-6, 50e-6), "H": (50e-6, 200e-6)}.
+                List-valued parameters (MNLIN W, S) are varied as a whole.
+            n_samples (int): Design points, rounded up to a power of two.
+            pool_size (int): TALGAT sessions solving in parallel.
+            batch_size (int): Parameter sets per request on a pool session.
+
+        Returns:
+            RLGCSurrogate: The stored table.
+        """
+        shared_code, script_code = self._read_code()
+        params = self._params()
+        # Key the table by the unresolved parameters, as queried by run_simulation
+        key_params = params.copy()
+        self._resolve_mesh(params, script_code, shared_code)
+        timeout = self.paths.get("talgat_timeout")
+
+        def solve(param_list):
+            if pool_size > 1:
+                with TalgatPool(self.paths["talgat_exe"], shared_code, size=pool_size) as pool:
+                    return pool.map(param_list, script_code, timeout, batch_size)
+            session = session_manager.get(self.paths["talgat_exe"], shared_code)
+            return session.run_batch(param_list, script_code, timeout)
+
+        start = time.time()
+        table = RLGCSurrogate.build(solve, script_code, shared_code, params, ranges, n_samples, key_params=key_params)
+        table.save(self._surrogate_path())
+        print(f"Built surrogate of {self.struct_name} from {len(table.samples)} solves in {time.time() - start:.2f} sec, "
+              f"leave-one-out error median {np.median(table.loo_errors):.2e}, max {np.max(table.loo_errors):.2e}")
+        return table
+
+    def _surrogate_solve(self, params: dict, script_code: str, shared_code: str, pool=None) -> dict:
+        """TALGAT result from the surrogate table, or from a real solve outside its trusted region."""
+        path = self._surrogate_path()
+        if os.path.exists(path):
+            table = RLGCSurrogate.load(path)
+            if table.key != RLGCSurrogate.fixed_key(script_code, shared_code, params, table.names):
+                print(f"Surrogate of {self.struct_name} was built for other fixed parameters, solving")
+            else:
+                result, error, inside = table.query(params)
+                if inside and error <= params.get("surrogate_tol", 0.01):
+                    print(f"Using surrogate of {self.struct_name}, estimated error {error:.2e}")
+                    return {"params": params, "result": result}
+                print(f"Point outside the trusted region of the {self.struct_name} surrogate "
+                      f"(inside bounds: {inside}, estimated error {error:.2e}), solving")
+        else:
+            print(f"No surrogate for {self.struct_name}, solving")
+        self._resolve_mesh(params, script_code, shared_code)
+        return self._solve(params, script_code, shared_code, pool)
+
+    def _solve_model(self, params: dict, script_code: str, shared_code: str, pool=None) -> dict:
+        """TALGAT result of one parameter set for the structure's MODELTYPE."""
+        if self.struct_params["MODELTYPE"] == "2D_Quasistatic":
+            self._resolve_mesh(params, script_code, shared_code)
+            return self._solve(params, script_code, shared_code, pool)
+        if self.struct_params["MODELTYPE"] == "2D_Surrogate":
+            return self._surrogate_solve(params, script_code, shared_code, pool)
+        raise NotImplementedError(f'Model type "{self.struct_params["MODELTYPE"]}" for "{self.struct_name}" not implemented yet')
+
+    def _convert(self, params: dict, result: dict, name: str):
+        """RLGC to S-parameters of one parameter set, returns (s_params, rlgc_struct, processor)."""
+        if "Z0" not in params.keys():
+            print(f"Warning, can't find Z0 for '{self.struct_name}', using default 50 Ohm")
+            params.update({"Z0":50})
+
+        # Convert RLGC to S-parameters
+        converter = RLGC2SConverter(params, [result])
+        s_params, rlgc_struct = converter.convert()
+        print(f"S-params shape for {name}: {s_params.shape}")
+
+        # converter.save_to_snp(s_params)
+
+        # Create SParamProcessor
+        processor = SParamProcessor(
+            s_params=s_params,
+            freqs=params['freq_range'],
+            z0=params['Z0'],
+            name=name
+        )
+        return s_params, rlgc_struct, processor
+
+    def _fit(self, params: dict, processor):
+        """Vector fitting of one parameter set, if enabled."""
+        if not params['do_vector_fitting']:
+            return
+        params.setdefault('vf_params', {
+            'n_poles_init_real': 3,
+            'n_poles_init_cmplx': 6,
+            'n_poles_add': 5,
+            'model_order_max': 100,
+            'iters_start': 3,
+            'iters_inter': 3,
+            'iters_final': 5,
+            'target_error': 0.01,
+            'alpha': 0.03,
+            'gamma': 0.03,
+            'nu_samples': 1.0,
+            'parameter_type': 's'
+        })
+        processor.perform_vector_fitting(**params['vf_params'])
+        print("Vector fitting performed")
+
+    def _export(self, params: dict, processor, name: str):
+        """SPICE subcircuit of a fitted parameter set."""
+        if not params['do_vector_fitting']:
+            return
+        processor.generate_subcircuit(
+            fitted_model_name=f"{name}_equiv_no_ref",
+            create_reference_pins=False
+        )
+
+    def _post_process(self, params: dict, result: dict, name: str) -> dict:
+        """RLGC to S-parameters and optional vector fitting of one parameter set."""
+        s_params, rlgc_struct, processor = self._convert(params, result, name)
 
         # Optionally perform vector fitting
-        if self.sim_params['do_vector_fitting']:
-            params.setdefault('vf_params', {
-                'n_poles_init_real': 3,
-                'n_poles_init_cmplx': 6,
-                'n_poles_add': 5,
-                'model_order_max': 100,
-                'iters_start': 3,
-                'iters_inter': 3,
-                'iters_final': 5,
-                'target_error': 0.01,
-                'alpha': 0.03,
-                'gamma': 0.03,
-                'nu_samples': 1.0,
-                'parameter_type': 's'
-            })
-            processor.perform_vector_fitting(**params['vf_params'])
-
-            subcircuit = processor.generate_subcircuit(
-                fitted_model_name=f"{self.struct_name}_equiv_no_ref",
-                create_reference_pins=False
-            )
-            print("Vector fitting performed")
+        self._fit(params, processor)
+        self._export(params, processor, name)
+
+        return {"params": params, "s_params": s_params, "rlgc": rlgc_struct, "processor": processor}
+
+    def run_simulation(self):
+        shared_code, script_code = self._read_code()
+        params = self._params()
+        result = self._solve_model(params, script_code, shared_code)
+
+        return self._post_process(params, result, self.struct_name)
+
+    def _expand(self, grid: dict = None, points: list = None) -> list:
+        """Full parameter sets of every grid combination, each combined with every point."""
+        overrides = [{}]
+        if grid:
+            overrides = [dict(zip(grid, values)) for values in itertools.product(*grid.values())]
+        if points:
+            overrides = [dict(combination, **point) for combination in overrides for point in points]
+        return [self._params(override) for override in overrides]
+
+    def run_sweep(self, grid: dict = None, points: list = None, pool_size: int = 1, batch_size: int = 1) -> list:
+        """
+        Run the structure for many parameter sets, solving every unique cross-section only once.
+
+        Parameters are split by talgat.rlgccache.POSTPROCESS_KEYS: sets that differ only in length,
+        Z0, freq_range, converter or VF settings share one TALGAT solve. Unique solves come from
+        the RLGC cache or run as one batch request (pool_size=1) or on a TalgatPool; conversion
+        and vector fitting then run for every set.
+
+        Args:
+            grid (dict, optional): Parameter name -> list of values; every combination is run.
+            points (list, optional): Parameter dictionaries, each combined with every grid combination.
+            pool_size (int): TALGAT sessions solving in parallel.
+            batch_size (int): Parameter sets per request on a pool session.
+
+        Returns:
+            list: Per parameter set {"params", "s_params", "rlgc", "processor"}, or {"params", "error"}
+                if its solve failed.
+        """
+        if self.struct_params["MODELTYPE"] != "2D_Quasistatic":
+            raise NotImplementedError(f'Model type "{self.struct_params["MODELTYPE"]}" for "{self.struct_name}" not implemented yet')
+        shared_code, script_code = self._read_code()
+
+        param_list = self._expand(grid, points)
+        for params in param_list:
+            self._resolve_mesh(params, script_code, shared_code)
+
+        keys = [make_key(script_code, shared_code, params) for params in param_list]
+        unique = {}
+        for key, params in zip(keys, param_list):
+            unique.setdefault(key, params)
+
+        cache = self._rlgc_cache()
+        solved = {}
+        if cache is not None:
+            for key in unique:
+                cached = cache.get(key)
+                if cached is not None:
+                    solved[key] = {"params": unique[key], "result": cached}
+        missing = [key for key in unique if key not in solved]
+        print(f"Sweep of {self.struct_name}: {len(param_list)} parameter sets, {len(unique)} unique cross-sections, "
+              f"{len(unique) - len(missing)} cached, {len(missing)} to solve")
+
+        if missing:
+            start_talgat = time.time()
+            timeout = self.paths.get("talgat_timeout")
+            if pool_size > 1:
+                with TalgatPool(self.paths["talgat_exe"], shared_code, size=pool_size) as pool:
+                    results = pool.map([unique[key] for key in missing], script_code, timeout, batch_size)
+            else:
+                session = session_manager.get(self.paths["talgat_exe"], shared_code)
+                results = session.run_batch([unique[key] for key in missing], script_code, timeout)
+            print(f"Completed {len(missing)} TALGAT simulations in {time.time() - start_talgat:.2f} sec")
+            sweep_timings = TimingStats()
+            for result in results:
+                if "result" in result and "timings" in result["result"]:
+                    sweep_timings.add(result["result"]["timings"])
+            print(sweep_timings.report())
+            for key, result in zip(missing, results):
+                solved[key] = result
+                if "error" in result:
+                    print(f"Warning, TALGAT simulation of '{self.struct_name}' failed: {result['error']}")
+                elif cache is not None:
+                    cache.put(key, result["result"])
+
+        sweep_results = []
+        for index, (key, params) in enumerate(zip(keys, param_list)):
+            if "error" in solved[key]:
+                sweep_results.append({"params": params, "error": solved[key]["error"]})
+            else:
+                sweep_results.append(self._post_process(params, solved[key], f"{self.struct_name}_{index + 1}"))
+        return sweep_results
+
+    def run_pipeline(self, grid: dict = None, points: list = None, **stage_options) -> list:
+        """
+        Run the structure for many parameter sets with solve, conversion, vector fitting and
+        subcircuit export overlapping (see pipeline.run_pipeline).
+
+        Args:
+            grid (dict, optional): Parameter name -> list of values; every combination is run.
+            points (list, optional): Parameter dictionaries, each combined with every grid combination.
+            **stage_options: solve_workers, convert_workers, fit_workers, export_workers, queue_size.
 
+        Returns:
+            list: As run_sweep.
+        """
+        param_list = self._expand(grid, points)
+        jobs = [(self, params, f"{self.struct_name}_{index + 1}") for index, params in enumerate(param_list)]
+        return run_pipeline(jobs, **stage_options)
 
 
 if __name__ == "__main__":
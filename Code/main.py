@@ -18,6 +18,11 @@ def gen_path():
         "main": os.path.dirname(os.path.abspath(__file__)),
         "talgat_exe": r"C:\Program Files\TALGAT 2021\PythonClient.exe",
         "talgat_code": os.path.join(os.path.dirname(os.path.abspath(__file__)), "talgat"),
+        "talgat_timeout": None,  # seconds per TALGAT request, None waits forever
+        "rlgc_cache": os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "rlgc.sqlite"),  # None disables
+        "rlgc_cache_size": 512 * 2 ** 20,  # bytes
+        "mesh_records": os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "mesh.json"),
+        "surrogates": os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "surrogates"),
         "shared": None
     }
     # try:
@@ -35,14 +40,7 @@ def gen_path():
 def run_all():
     shared_code = open(os.path.join(main_path, "talgat", "shared.py"), encoding="utf-8").read()
     session = TalgatSession(talgat_path)
-
-    # Write shared.py to a temporary file
-    with tempfile.NamedTemporaryFile("w", delete=False, suffix=".py", encoding="utf-8") as tmp:
-        tmp.write(shared_code)
-        shared_path = tmp.name
-
-    session.proc.stdin.write(f"exec(open(r'''{shared_path}''').read())\n")
-    session.proc.stdin.flush()
+    session.load_shared(shared_code)
 
     all_results = {}
 
@@ -114,8 +112,6 @@ def run_all():
 
         all_results[struct_name] = struct_results
 
-    # Clean up temporary file
-    os.remove(shared_path)
     session.close()
 
     return all_results
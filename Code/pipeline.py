@@ -0,0 +1,116 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from talgat.talgatpool import TalgatPool
+
+# End of stream marker passed down the stage queues
+_DONE = object()
+
+
+async def _stage(name: str, work, inbox: asyncio.Queue, outbox: asyncio.Queue, workers: int):
+    """
+    Run work(job) in an executor for every job of inbox and pass the job on to outbox.
+
+    workers jobs are processed at the same time. outbox is bounded, so a stage waits for the
+    next stage once queue_size jobs are ready, instead of running ahead. A job that failed in an
+    earlier stage is passed on unchanged.
+    """
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name) as executor:
+        async def worker():
+            while True:
+                job = await inbox.get()
+                if job is _DONE:
+                    # Let the other workers of this stage see the end of the stream too
+                    await inbox.put(_DONE)
+                    return
+                if "error" not in job:
+                    try:
+                        await loop.run_in_executor(executor, work, job)
+                    except Exception as e:
+                        job["error"] = f"{name} failed: {type(e).__name__}: {e}"
+                        print(f"Warning, {job['name']}: {job['error']}")
+                await outbox.put(job)
+
+        await asyncio.gather(*(worker() for _ in range(workers)))
+    await outbox.put(_DONE)
+
+
+async def _run(jobs: list, solve_workers: int, convert_workers: int, fit_workers: int, export_workers: int,
+               queue_size: int) -> list:
+    pools = {}
+    pools_lock = threading.Lock()
+
+    def solve(job):
+        handler, params = job["handler"], job["params"]
+        shared_code, script_code = handler._read_code()
+        pool = None
+        if solve_workers > 1:
+            pool_key = (repr(handler.paths["talgat_exe"]), shared_code)
+            with pools_lock:
+                if pool_key not in pools:
+                    pools[pool_key] = TalgatPool(handler.paths["talgat_exe"], shared_code, size=solve_workers)
+                pool = pools[pool_key]
+        job["result"] = handler._solve_model(params, script_code, shared_code, pool)
+
+    def convert(job):
+        job["s_params"], job["rlgc"], job["processor"] = job["handler"]._convert(job["params"], job["result"], job["name"])
+
+    def fit(job):
+        job["handler"]._fit(job["params"], job["processor"])
+
+    def export(job):
+        job["handler"]._export(job["params"], job["processor"], job["name"])
+
+    stages = [("solve", solve, solve_workers), ("convert", convert, convert_workers),
+              ("fit", fit, fit_workers), ("export", export, export_workers)]
+    # The solve stage is fed from an unbounded queue, every later queue is bounded
+    queues = [asyncio.Queue()] + [asyncio.Queue(maxsize=queue_size) for _ in stages]
+    for index, (handler, params, name) in enumerate(jobs):
+        queues[0].put_nowait({"index": index, "handler": handler, "params": params, "name": name})
+    queues[0].put_nowait(_DONE)
+
+    async def collect():
+        done = []
+        while (job := await queues[-1].get()) is not _DONE:
+            done.append(job)
+        return done
+
+    try:
+        tasks = [_stage(name, work, queues[i], queues[i + 1], workers)
+                 for i, (name, work, workers) in enumerate(stages)]
+        done = (await asyncio.gather(*tasks, collect()))[-1]
+    finally:
+        for pool in pools.values():
+            pool.close()
+    return sorted(done, key=lambda job: job["index"])
+
+
+def run_pipeline(jobs: list, solve_workers: int = 1, convert_workers: int = 1, fit_workers: int = 1,
+                 export_workers: int = 1, queue_size: int = 2) -> list:
+    """
+    Run TALGAT solve, RLGC->S conversion, vector fitting and subcircuit export as overlapping stages.
+
+    Every stage runs in its own thread executor and the stages are connected by bounded asyncio
+    queues, so the solver works on job k+1 while job k is converted and fitted on the CPU.
+    numpy/scipy release the GIL in the heavy parts of conversion and fitting.
+
+    Args:
+        jobs (list): (Simulation_Handler, full parameter dict, name) per job; the jobs may belong to
+            different structures.
+        solve_workers (int): Concurrent solves; above 1 they run on a TalgatPool of this size,
+            otherwise on the shared warm session.
+        convert_workers, fit_workers, export_workers (int): Concurrent jobs of the other stages.
+        queue_size (int): Jobs a stage may finish ahead of the next one (back-pressure).
+
+    Returns:
+        list: Per job {"params", "s_params", "rlgc", "processor"}, or {"params", "error"} if a stage
+            failed, in the order of jobs.
+    """
+    start = time.time()
+    done = asyncio.run(_run(jobs, solve_workers, convert_workers, fit_workers, export_workers, queue_size))
+    failed = sum("error" in job for job in done)
+    print(f"Completed pipeline of {len(done)} jobs ({failed} failed) in {time.time() - start:.2f} sec")
+    return [{"params": job["params"], "error": job["error"]} if "error" in job else
+            {key: job[key] for key in ("params", "s_params", "rlgc", "processor")} for job in done]
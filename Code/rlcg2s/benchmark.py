@@ -0,0 +1,179 @@
+import time
+import numpy as np
+from scipy.linalg import eig, inv
+from rlcg2s.rlcg2s import RLGC2SConverter
+
+
+def synthetic_result(num_lines, f0, loss=True):
+    """
+    Build a TALGAT-like result dictionary for a uniform bus of microstrip lines.
+
+    Args:
+        num_lines (int): Number of signal conductors.
+        f0 (ndarray): Frequencies at which mR and mG are given.
+        loss (bool): If False, mR and mG are zero as returned by CalMat.
+
+    Returns:
+        dict: Result in the same format as TalgatSession.run_script.
+    """
+    idx = np.arange(num_lines)
+    dist = np.abs(idx[:, np.newaxis] - idx[np.newaxis, :])
+    mL = 4.0e-7 * 0.3 ** dist
+    mC = -3.0e-11 * 0.25 ** dist
+    np.fill_diagonal(mC, 1.2e-10)
+    if loss:
+        f0 = np.asarray(f0)
+        mR = 40.0 * np.eye(num_lines)[:, :, np.newaxis] * np.sqrt(f0 / 1e9) \
+            + 4.0 * (0.2 ** dist)[:, :, np.newaxis] * np.sqrt(f0 / 1e9)
+        mG = 2 * np.pi * f0 * 0.003 * mC[:, :, np.newaxis]
+    else:
+        mR = np.zeros((num_lines, num_lines, 1))
+        mG = np.zeros((num_lines, num_lines, 1))
+    return {"params": {}, "result": {"mL": mL.tolist(), "mC": mC.tolist(),
+                                     "mR": mR.tolist(), "mG": mG.tolist()}}
+
+
+def reference_convert(converter):
+    """Per-frequency loop used by RLGC2SConverter.convert before vectorization."""
+    resistance, inductance, conductance, capacitance = converter._prepare_matrices()
+    freqpts = converter.freq_range.size
+    num_lines = converter.num_lines
+    s_params = np.zeros((freqpts, 2 * num_lines, 2 * num_lines), dtype=complex)
+    z0_matrix = converter.z0 * np.eye(2 * num_lines)
+    for freqidx in range(freqpts):
+        w = 2 * np.pi * converter.freq_range[freqidx]
+        Z = resistance[freqidx] + 1j * w * inductance[freqidx]
+        Y = conductance[freqidx] + 1j * w * capacitance[freqidx]
+        D, V = eig(Z @ Y)
+        gammaEig = np.sqrt(D)
+        gamma = V @ np.diag(gammaEig) @ inv(V)
+        Zc = inv(gamma) @ Z
+        cosh_gammaL = V @ np.diag(np.cosh(gammaEig * converter.length)) @ inv(V)
+        sinh_gammaL = V @ np.diag(np.sinh(gammaEig * converter.length)) @ inv(V)
+        A = cosh_gammaL
+        B = sinh_gammaL @ Zc
+        C = inv(Zc) @ sinh_gammaL
+        D = inv(Zc) @ cosh_gammaL @ Zc
+        Cinv = inv(C)
+        Z11 = A @ Cinv
+        Z12 = Z11 @ D - B
+        Z21 = Cinv
+        Z22 = Z21 @ D
+        Z_params = np.block([[Z11, Z12], [Z21, Z22]])
+        s_params[freqidx] = (Z_params - z0_matrix) @ inv(Z_params + z0_matrix)
+    return s_params
+
+
+def timed(func, repeat=3):
+    """Return (best wall time in seconds, last result) of func()."""
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = func()
+        best = min(best, time.perf_counter() - start)
+    return best, out
+
+
+def bench_vectorized(num_lines=5, freqpts=670, loss=True):
+    """Compare the vectorized converter against the per-frequency reference loop."""
+    f0 = np.linspace(1.5e9, 3.5e9, 5)
+    params = {
+        "f0": f0,
+        "freq_range": np.linspace(0.1e9, 67e9, freqpts),
+        "length": 0.1,
+        "Z0": 50,
+        "loss": loss,
+    }
+    converter = RLGC2SConverter(params, [synthetic_result(num_lines, f0, loss)])
+    t_ref, s_ref = timed(lambda: reference_convert(converter), repeat=1)
+    t_vec, (s_vec, _) = timed(converter.convert)
+    err = np.max(np.abs(s_vec - s_ref))
+    print(f"N={num_lines:3d} F={freqpts:6d} loss={loss!s:5}: loop {t_ref:8.3f} s, "
+          f"vectorized {t_vec:8.3f} s, speedup {t_ref / t_vec:6.1f}x, max|dS| {err:.2e}")
+
+
+def bench_lengths(num_lines=5, freqpts=670, num_lengths=20, loss=True):
+    """Compare convert_lengths against one convert call per length."""
+    f0 = np.linspace(1.5e9, 3.5e9, 5)
+    lengths = np.linspace(100e-6, 0.1, num_lengths)
+    params = {
+        "f0": f0,
+        "freq_range": np.linspace(0.1e9, 67e9, freqpts),
+        "length": lengths[0],
+        "Z0": 50,
+        "loss": loss,
+    }
+    result = synthetic_result(num_lines, f0, loss)
+
+    def one_by_one():
+        s = []
+        for length in lengths:
+            params["length"] = length
+            s.append(RLGC2SConverter(params, [result]).convert()[0])
+        return np.array(s)
+
+    t_ref, s_ref = timed(one_by_one, repeat=1)
+    t_len, (s_len, _) = timed(lambda: RLGC2SConverter(params, [result]).convert_lengths(lengths))
+    err = np.max(np.abs(s_len - s_ref))
+    print(f"N={num_lines:3d} F={freqpts:6d} lengths={num_lengths:4d} loss={loss!s:5}: separate {t_ref:8.3f} s, "
+          f"convert_lengths {t_len:8.3f} s, speedup {t_ref / t_len:6.1f}x, max|dS| {err:.2e}")
+
+
+def bench_scaling(sizes=(4, 8, 16, 32, 64), freqpts=670):
+    """Scaling of the lossy conversion with the number of lines for each modal solver."""
+    f0 = np.linspace(1.5e9, 3.5e9, 5)
+    modes = {
+        "general eig": {"modal_solver": "exact", "detect_symmetry": False},
+        "symmetric split": {"modal_solver": "exact", "detect_symmetry": True},
+        "perturbation": {"modal_solver": "perturbation"},
+    }
+    for num_lines in sizes:
+        result = synthetic_result(num_lines, f0)
+        line = f"N={num_lines:3d} F={freqpts:6d}:"
+        s_exact = None
+        for name, options in modes.items():
+            params = {
+                "f0": f0,
+                "freq_range": np.linspace(0.1e9, 67e9, freqpts),
+                "length": 0.1,
+                "Z0": 50,
+                "loss": True,
+                **options,
+            }
+            t, (s, _) = timed(RLGC2SConverter(params, [result]).convert, repeat=1)
+            if s_exact is None:
+                s_exact = s
+            line += f" {name} {t:7.3f} s (max|dS| {np.max(np.abs(s - s_exact)):.1e});"
+        print(line)
+
+
+def bench_workers(num_lines=8, freqpts=20000, workers=(1, 2, 4, 8)):
+    """Wall time of a large lossy conversion against the number of worker processes."""
+    f0 = np.linspace(1.5e9, 3.5e9, 5)
+    result = synthetic_result(num_lines, f0)
+    s_single = None
+    for count in workers:
+        params = {
+            "f0": f0,
+            "freq_range": np.linspace(0.1e9, 67e9, freqpts),
+            "length": 0.1,
+            "Z0": 50,
+            "loss": True,
+            "workers": count,
+        }
+        t, (s, _) = timed(RLGC2SConverter(params, [result]).convert, repeat=1)
+        if s_single is None:
+            s_single = s
+        print(f"N={num_lines:3d} F={freqpts:6d} workers={count:3d}: {t:8.3f} s, "
+              f"max|dS| {np.max(np.abs(s - s_single)):.1e}")
+
+
+if __name__ == "__main__":
+    # Run from the Code directory: python -m rlcg2s.benchmark
+    for n in (1, 2, 5, 16):
+        bench_vectorized(num_lines=n)
+    for n in (1, 5, 16):
+        bench_vectorized(num_lines=n, loss=False)
+    bench_lengths()
+    bench_scaling()
+    bench_workers()
@@ -0,0 +1,66 @@
+import numpy as np
+
+
+class PackedSymmetric:
+    """Class to store a stack of symmetric matrices as their upper triangles."""
+
+    def __init__(self, packed, n):
+        """
+        Initialize with packed data.
+
+        Args:
+            packed (ndarray): Upper triangles of shape (F, n * (n + 1) / 2), row by row.
+            n (int): Size of each square matrix.
+        """
+        self.packed = packed
+        self.n = n
+        self._rows, self._cols = np.triu_indices(n)
+
+    @classmethod
+    def empty(cls, freqpts, n, dtype=np.complex64):
+        """Allocate packed storage for freqpts matrices of size n × n."""
+        return cls(np.empty((freqpts, n * (n + 1) // 2), dtype=dtype), n)
+
+    @classmethod
+    def pack(cls, full, dtype=np.complex64):
+        """
+        Pack a frequency-major stack of symmetric matrices.
+
+        Args:
+            full (ndarray): Symmetric matrices of shape (F, n, n).
+            dtype: Storage dtype, default complex64.
+
+        Returns:
+            PackedSymmetric: Packed copy of full.
+        """
+        packed = cls.empty(full.shape[0], full.shape[1], dtype)
+        packed.fill(0, full.shape[0], full)
+        return packed
+
+    def fill(self, start, stop, full):
+        """Store symmetric matrices of shape (stop - start, n, n) at frequency indices [start, stop)."""
+        self.packed[start:stop] = full[:, self._rows, self._cols]
+
+    def unpack(self, dtype=complex):
+        """
+        Rebuild the full matrices.
+
+        Returns:
+            ndarray: Symmetric matrices of shape (F, n, n).
+        """
+        full = np.empty((self.packed.shape[0], self.n, self.n), dtype=dtype)
+        full[:, self._rows, self._cols] = self.packed
+        full[:, self._cols, self._rows] = self.packed
+        return full
+
+    @property
+    def shape(self):
+        """Shape of the unpacked data, (F, n, n)."""
+        return self.packed.shape[0], self.n, self.n
+
+    @property
+    def nbytes(self):
+        return self.packed.nbytes
+
+    def __array__(self, dtype=None, copy=None):
+        return self.unpack(complex if dtype is None else dtype)
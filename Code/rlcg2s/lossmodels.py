@@ -0,0 +1,101 @@
+import numpy as np
+
+C0 = 299792458.0
+
+
+def djordjevic_sarkar(freqs, er, tan_delta, f_ref=1e9, f1=1e3, f2=1e12):
+    """
+    Causal wideband permittivity of the Djordjevic-Sarkar model.
+
+        eps(f) = eps_inf + d_eps / ln(f2 / f1) * ln((f2 + j f) / (f1 + j f))
+
+    eps_inf and d_eps are chosen so that eps(f_ref) = er * (1 - j * tan_delta).
+
+    Args:
+        freqs (ndarray): Frequencies in Hz.
+        er (float): Relative permittivity at f_ref.
+        tan_delta (float): Loss tangent at f_ref.
+        f_ref (float): Frequency of the er, tan_delta data, default 1 GHz.
+        f1, f2 (float): Lower and upper corner of the relaxation band.
+
+    Returns:
+        ndarray: Complex relative permittivity eps' - j eps'' at freqs.
+    """
+    freqs = np.asarray(freqs, dtype=float)
+    scale = np.log(f2 / f1)
+    log_ref = np.log((f2 + 1j * f_ref) / (f1 + 1j * f_ref))
+    d_eps = -er * tan_delta * scale / log_ref.imag
+    eps_inf = er - d_eps / scale * log_ref.real
+    return eps_inf + d_eps / scale * np.log((f2 + 1j * freqs) / (f1 + 1j * freqs))
+
+
+def dielectric_matrices(freqs, L, C, er, tan_delta, f_ref=1e9, f1=1e3, f2=1e12):
+    """
+    C(f) and G(f) of a line whose dielectric follows the Djordjevic-Sarkar model.
+
+    The air capacitance C_air = L^-1 / c^2 follows from the (dielectric independent) inductance;
+    the remainder C - C_air is scaled with eps(f) - 1 of the substrate, so that the complex
+    capacitance is C_air + (C - C_air) * (eps(f) - 1) / (er - 1).
+
+    Args:
+        freqs (ndarray): Frequencies in Hz, shape (F,).
+        L (ndarray): Inductance matrix (N, N).
+        C (ndarray): Capacitance matrix (N, N) solved with permittivity er.
+        er, tan_delta, f_ref, f1, f2: Substrate data, see djordjevic_sarkar.
+
+    Returns:
+        tuple: C(f) and G(f), each of shape (F, N, N).
+    """
+    freqs = np.asarray(freqs, dtype=float)
+    C_air = np.linalg.inv(L) / C0 ** 2
+    if er == 1:
+        # No dielectric to disperse
+        shape = (len(freqs),) + C.shape
+        return np.broadcast_to(C, shape), np.zeros(shape)
+    K = (C - C_air) / (er - 1)
+    eps = djordjevic_sarkar(freqs, er, tan_delta, f_ref, f1, f2)
+    C_f = C_air + (eps.real - 1)[:, np.newaxis, np.newaxis] * K
+    G_f = (-2 * np.pi * freqs * eps.imag)[:, np.newaxis, np.newaxis] * K
+    return C_f, G_f
+
+
+def fit_skin_effect(f0, R):
+    """
+    Least-squares fit of R(f) = R0 + Rs * sqrt(f) to resistance matrices.
+
+    Args:
+        f0 (ndarray): Frequencies of the solves, shape (F0,).
+        R (ndarray): Resistance matrices, shape (F0, N, N).
+
+    Returns:
+        tuple: R0 and Rs, each of shape (N, N). With a single f0, R0 is zero.
+    """
+    f0 = np.asarray(f0, dtype=float)
+    R = np.asarray(R, dtype=float)
+    if len(f0) == 1:
+        return np.zeros_like(R[0]), R[0] / np.sqrt(f0[0])
+    basis = np.stack([np.ones_like(f0), np.sqrt(f0)], axis=1)
+    coeffs = np.linalg.lstsq(basis, R.reshape(len(f0), -1), rcond=None)[0]
+    return coeffs[0].reshape(R.shape[1:]), coeffs[1].reshape(R.shape[1:])
+
+
+def conductor_matrices(freqs, L, R0, Rs):
+    """
+    R(f) and L(f) of the skin-effect model.
+
+    The internal impedance R0 + Rs * sqrt(f) * (1 + j) is causal (~ sqrt(j * omega)), so the
+    internal inductance Rs * sqrt(f) / omega is added to the external inductance L.
+
+    Args:
+        freqs (ndarray): Frequencies in Hz, shape (F,), all > 0.
+        L (ndarray): External inductance matrix (N, N).
+        R0, Rs (ndarray): Fit of fit_skin_effect, each (N, N).
+
+    Returns:
+        tuple: R(f) and L(f), each of shape (F, N, N).
+    """
+    freqs = np.asarray(freqs, dtype=float)
+    sqrt_f = np.sqrt(freqs)[:, np.newaxis, np.newaxis]
+    R_f = R0 + Rs * sqrt_f
+    L_f = L + Rs * sqrt_f / (2 * np.pi * freqs[:, np.newaxis, np.newaxis])
+    return R_f, L_f
@@ -1,7 +1,12 @@
 import numpy as np
 import skrf
-from scipy.linalg import eig, inv
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
 from scipy.interpolate import interp1d
+from scipy.linalg import cholesky, eigh, solve_triangular
+from rlcg2s.touchstone import TouchstoneWriter
+from rlcg2s.compact import PackedSymmetric
+from rlcg2s import lossmodels
 
 
 class RLGC2SConverter:
@@ -12,159 +17,543 @@ class RLGC2SConverter:
         Initialize with params and results dictionaries.
 
         Args:
-            params (dict): Dictionary containing simulation parameters (f0, freq_range, length, Z0, etc.).
+            params (dict): Dictionary containing simulation parameters (f0, freq_range, length, Z0,
+                interp_R, interp_G, modal_solver, detect_symmetry, workers, storage, rlgc_model, etc.).
             results (list): List of dictionaries containing RLGC matrices (mR, mL, mG, mC).
         """
         self.params = params
         self.results = results
         self.freq_range = np.asarray(params['freq_range'])
-        self.f0 = np.asarray(params['f0'])
+        # With adaptive f0 the solver returns the frequencies it actually used
+        self.f0 = np.asarray(results[0]['result'].get('f0', params['f0']), dtype=float)
         self.length = params['length']
         self.z0 = params['Z0']
         self.num_lines = len(results[0]['result']['mL'])
         self.loss = params.get('loss')
-
-    def _interpolate_matrices(self, matrix, freq_orig, freq_new):
+        self.interp_R = params.get('interp_R', 'linear')
+        self.interp_G = params.get('interp_G', 'linear')
+        self.modal_solver = params.get('modal_solver', 'exact')
+        self.detect_symmetry = params.get('detect_symmetry', True)
+        self.workers = params.get('workers', 1)
+        self.parallel_min_points = params.get('parallel_min_points', 2000)
+        self.storage = params.get('storage', 'full')
+        self.compact_dtype = np.dtype(params.get('compact_dtype', 'complex64'))
+        self.rlgc_model = params.get('rlgc_model', 'interpolate')
+        if self.rlgc_model not in ('interpolate', 'causal'):
+            raise ValueError(f"Unknown rlgc_model '{self.rlgc_model}', use 'interpolate' or 'causal'")
+
+    def _interpolate_matrices(self, matrix, freq_orig, freq_new, scheme='linear'):
         """
         Interpolate RLGC matrices from original frequencies to new frequencies.
 
+        The whole (F, N, N) tensor is interpolated in one call. Available schemes:
+            'linear' - piecewise linear in f with linear extrapolation;
+            'sqrt' - piecewise linear in sqrt(f), i.e. skin-effect R(f) ~ sqrt(f) outside f0;
+            'proportional' - least-squares fit through the origin, G(f) = k * f.
+
         Args:
-            matrix (ndarray): Matrix of shape (N, N, len(freq_orig)) to interpolate.
+            matrix (ndarray): Matrix of shape (len(freq_orig), N, N) to interpolate.
             freq_orig (ndarray): Original frequency points.
             freq_new (ndarray): Target frequency points.
+            scheme (str): Interpolation scheme, default 'linear'.
 
         Returns:
-            ndarray: Interpolated matrix of shape (N, N, len(freq_new)).
+            ndarray: Interpolated matrix of shape (len(freq_new), N, N).
         """
-        n = matrix.shape[0]
-        interp_matrix = np.zeros((n, n, len(freq_new)), dtype=matrix.dtype)
+        if scheme == 'proportional':
+            k = np.tensordot(freq_orig, matrix, axes=(0, 0)) / np.dot(freq_orig, freq_orig)
+            return freq_new[:, np.newaxis, np.newaxis] * k
+        if scheme == 'linear':
+            x_orig, x_new = freq_orig, freq_new
+        elif scheme == 'sqrt':
+            x_orig, x_new = np.sqrt(freq_orig), np.sqrt(freq_new)
+        else:
+            raise ValueError(f"Unknown interpolation scheme '{scheme}', use 'linear', 'sqrt' or 'proportional'")
 
-        for i in range(n):
-            for j in range(n):
-                interp_func = interp1d(freq_orig, matrix[i, j, :], kind='linear', fill_value="extrapolate")
-                interp_matrix[i, j, :] = interp_func(freq_new)
+        if len(freq_orig) == 1:
+            # Single f0: constant for 'linear', scaled by sqrt(f / f0) for 'sqrt'
+            scale = x_new / x_orig if scheme == 'sqrt' else np.ones_like(x_new)
+            return scale[:, np.newaxis, np.newaxis] * matrix
 
-        return interp_matrix
+        interp_func = interp1d(x_orig, matrix, kind='linear', axis=0, fill_value="extrapolate")
+        return interp_func(x_new)
 
     def _prepare_matrices(self):
         """
-        Prepare RLGC matrices by copying mL, mC and interpolating mR, mG.
+        Prepare RLGC matrices over freq_range: mL, mC are broadcast and mR, mG interpolated.
+
+        Frequency-independent matrices are stored once as (N, N) and returned as read-only
+        (F, N, N) broadcast views with a zero stride along the frequency axis, so no copies
+        are made for each frequency point.
 
         Returns:
-            tuple: Interpolated or copied matrices (mR, mL, mG, mC).
+            tuple: Interpolated or broadcast matrices (mR, mL, mG, mC), each of shape (F, N, N).
         """
         result = self.results[0]['result']
-        mL = np.array(result['mL'])[:, :, np.newaxis]
-        mC = np.array(result['mC'])[:, :, np.newaxis]
-        mR = np.array(result['mR'])
-        mG = np.array(result['mG'])
-
-        # Copy mL and mC to all frequencies
-        mL = np.repeat(mL, len(self.freq_range), axis=2)
-        mC = np.repeat(mC, len(self.freq_range), axis=2)
-
+        mL = np.asarray(result['mL'], dtype=float)
+        mC = np.asarray(result['mC'], dtype=float)
+        # TALGAT returns mR, mG as (N, N, len(f0))
+        mR = np.moveaxis(np.asarray(result['mR'], dtype=float), 2, 0)
+        mG = np.moveaxis(np.asarray(result['mG'], dtype=float), 2, 0)
+        shape = (len(self.freq_range),) + mL.shape
+
+        # Share mL and mC between all frequencies
+        mL = np.broadcast_to(mL, shape)
+        mC = np.broadcast_to(mC, shape)
+
+        if self.loss and self.rlgc_model == 'causal':
+            return self._causal_matrices(mR, mL[0], mC[0])
         if self.loss:
-            mR = self._interpolate_matrices(mR, self.f0, self.freq_range)
-            mG = self._interpolate_matrices(mG, self.f0, self.freq_range)
+            mR = self._interpolate_matrices(mR, self.f0, self.freq_range, self.interp_R)
+            mG = self._interpolate_matrices(mG, self.f0, self.freq_range, self.interp_G)
         else:
-            # Expand zeros array
-            mR = np.repeat(mR, len(self.freq_range), axis=2)
-            mG = np.repeat(mG, len(self.freq_range), axis=2)
+            # Broadcast zeros array
+            mR = np.broadcast_to(mR[0], shape)
+            mG = np.broadcast_to(mG[0], shape)
 
         return mR, mL, mG, mC
 
-    def convert(self):
+    def _causal_matrices(self, mR, mL, mC):
         """
-        Convert RLGC parameters to S-parameters.
+        RLGC matrices over freq_range from the causal models of rlcg2s.lossmodels.
+
+        R(f), L(f) follow the skin-effect model fitted to mR at f0 (one or two f0 are enough);
+        C(f), G(f) follow the Djordjevic-Sarkar model of the substrate (ds_er, ds_td at ds_fref,
+        by default ER1, TD1 at 1 GHz), so G solved by TALGAT is not used.
 
         Returns:
-            tuple: (s_params, rlgc_struct) where s_params is the S-parameter matrix
-                   and rlgc_struct contains RLGC and derived parameters.
+            tuple: Matrices (mR, mL, mG, mC), each of shape (F, N, N).
         """
-        # self._validate_inputs()
-        resistance, inductance, conductance, capacitance = self._prepare_matrices()
+        R0, Rs = lossmodels.fit_skin_effect(self.f0, mR)
+        # The air capacitance follows from the external inductance, without the internal part
+        mC, mG = lossmodels.dielectric_matrices(
+            self.freq_range, mL, mC,
+            self.params.get('ds_er', self.params.get('ER1')),
+            self.params.get('ds_td', self.params.get('TD1')),
+            self.params.get('ds_fref', 1e9),
+            self.params.get('ds_f1', 1e3),
+            self.params.get('ds_f2', 1e12),
+        )
+        mR, mL = lossmodels.conductor_matrices(self.freq_range, mL, R0, Rs)
+        return mR, mL, mG, mC
 
-        freqpts = self.freq_range.size
-        num_lines = self.num_lines
+    @staticmethod
+    def _is_constant(matrix):
+        """Check whether an (F, N, N) matrix does not change along the frequency axis."""
+        return matrix.strides[0] == 0 or np.all(matrix == matrix[:1])
+
+    def _is_frequency_independent(self, resistance, inductance, conductance, capacitance):
+        """
+        Check whether the line is lossless with constant L and C over the whole frequency range.
+
+        Returns:
+            bool: True if mR and mG are zero and mL, mC do not change with frequency.
+        """
+        return (self._is_constant(resistance) and not np.any(resistance[0])
+                and self._is_constant(conductance) and not np.any(conductance[0])
+                and self._is_constant(inductance) and self._is_constant(capacitance))
+
+    def _decompose_lossless(self, L, C):
+        """
+        Real modal decomposition of a lossless line, done once for all frequencies.
 
-        # Initialize output arrays
-        s_params = np.zeros((2 * num_lines, 2 * num_lines, freqpts), dtype=complex)
-        z0_matrix = self.z0 * np.eye(2 * num_lines)
+        Z·Y = -ω²·L·C, so the modes are those of L·C and only the eigenvalues scale with ω².
+        With the Cholesky factor C = Uᵀ·U, L·C is similar to the symmetric U·L·Uᵀ.
 
-        # Store characteristic impedance and propagation constants for all frequencies
-        Zc_all = np.zeros((num_lines, num_lines, freqpts), dtype=complex)
-        gamma_all = np.zeros((num_lines, num_lines, freqpts), dtype=complex)
+        Args:
+            L (ndarray): Inductance matrix of shape (N, N).
+            C (ndarray): Capacitance matrix of shape (N, N).
 
-        # For each frequency point
-        for freqidx in range(freqpts):
-            # Extract RLGC matrices for this frequency
-            R = resistance[:, :, freqidx]
-            L = inductance[:, :, freqidx]
-            G = conductance[:, :, freqidx]
-            C = capacitance[:, :, freqidx]
+        Returns:
+            tuple: (V, Vinv, beta) where beta = sqrt(eig(L·C)) is the modal phase constant
+                   divided by ω; V and its inverse are real (N, N) matrices.
+        """
+        U = cholesky(C)
+        mu, Q = eigh(U @ L @ U.T)
+        beta = np.sqrt(mu)
+        V = solve_triangular(U, Q)
+        Vinv = Q.T @ U
 
-            # Per-unit-length impedance and admittance
-            Z = R + 1j * 2 * np.pi * self.freq_range[freqidx] * L
-            Y = G + 1j * 2 * np.pi * self.freq_range[freqidx] * C
+        return V, Vinv, beta
+
+    def _decompose_perturbation(self, Z, Y, L, C):
+        """
+        Approximate modal decomposition of a lossy line in the modes of the lossless one.
+
+        The eigenvectors of L·C are computed once (real, symmetric-definite) and the losses
+        are treated as a first-order perturbation: gammaEig² ≈ diag(V^-1·Z·Y·V). The result is
+        exact when R is proportional to L and G to C, and costs two matrix products per
+        frequency instead of a general complex eig.
+
+        Args:
+            Z (ndarray): Per-unit-length impedance of shape (F, N, N).
+            Y (ndarray): Per-unit-length admittance of shape (F, N, N).
+            L (ndarray): Inductance matrix of shape (N, N).
+            C (ndarray): Capacitance matrix of shape (N, N).
+
+        Returns:
+            tuple: (V, gammaEig, W, gamma, Zc) as in _decompose, with a constant real V.
+        """
+        V, Vinv, _ = self._decompose_lossless(L, C)
+        VinvZ = Vinv @ Z
+        gammaEig = np.sqrt(np.einsum('fij,fji->fi', VinvZ, Y @ V))
 
+        W = VinvZ / gammaEig[:, :, np.newaxis]
+        Zc = V @ W
+        gamma = Zc @ Y
+
+        return V, gammaEig, W, gamma, Zc
+
+    @staticmethod
+    def _symmetry_basis(matrices, rtol=1e-8):
+        """
+        Detect mirror symmetry of the cross-section and build the matching orthogonal basis.
+
+        For a bus that is symmetric about its centre (e.g. uniform W/S) every RLGC matrix is
+        centrosymmetric, J·M·J = M with J the exchange matrix. In the basis of symmetric and
+        antisymmetric vectors such matrices are block-diagonal, so Z·Y splits into two
+        eigenproblems of about N/2 each.
+
+        Args:
+            matrices (iterable): (F, N, N) RLGC matrices.
+            rtol (float): Tolerance relative to the largest entry of each matrix.
+
+        Returns:
+            tuple or None: (Q, k) with Q orthogonal (N, N), whose first k columns are symmetric
+                           and the rest antisymmetric, or None if the structure is not symmetric.
+        """
+        n = matrices[0].shape[1]
+        if n < 2:
+            return None
+        for matrix in matrices:
+            if matrix.strides[0] == 0:
+                matrix = matrix[:1]
+            if not np.allclose(matrix, matrix[:, ::-1, ::-1], rtol=0, atol=rtol * np.max(np.abs(matrix))):
+                return None
+
+        half = n // 2
+        k = n - half
+        Q = np.zeros((n, n))
+        for i in range(half):
+            Q[i, i] = Q[n - 1 - i, i] = np.sqrt(0.5)
+            Q[i, k + i] = np.sqrt(0.5)
+            Q[n - 1 - i, k + i] = -np.sqrt(0.5)
+        if n % 2:
+            Q[half, half] = 1.0
+        return Q, k
+
+    def _decompose(self, Z, Y, basis=None):
+        """
+        Modal decomposition of Z·Y for a stack of frequency points.
+
+        Uses Zc = gamma^-1·Z = V·diag(1 / gammaEig)·V^-1·Z and gamma = Zc·Y,
+        so only one linear solve with V is needed and no matrix is inverted explicitly.
+        With a symmetry basis the eigenproblem and the solve are done per symmetric and
+        antisymmetric block.
+
+        Args:
+            Z (ndarray): Per-unit-length impedance of shape (F, N, N).
+            Y (ndarray): Per-unit-length admittance of shape (F, N, N).
+            basis (tuple, optional): (Q, k) from _symmetry_basis.
+
+        Returns:
+            tuple: (V, gammaEig, W, gamma, Zc) stacked along the first (frequency) axis,
+                   where W = V^-1·Zc.
+        """
+        if basis is None:
             # Eigen decomposition of Z*Y
-            D, V = eig(Z @ Y)
-            gammaEig = np.sqrt(D)  # Propagation constants
-
-            # Calculate gamma matrix
-            gamma = V @ np.diag(gammaEig) @ inv(V)
-
-            # Characteristic impedance matrix
-            Zc = inv(gamma) @ Z
-
-            # Hyperbolic functions of gamma*length
-            cosh_gammaL = V @ np.diag(np.cosh(gammaEig * self.length)) @ inv(V)
-            sinh_gammaL = V @ np.diag(np.sinh(gammaEig * self.length)) @ inv(V)
-
-            # ABCD parameters
-            A = cosh_gammaL
-            B = sinh_gammaL @ Zc
-            C = inv(Zc) @ sinh_gammaL
-            D = inv(Zc) @ cosh_gammaL @ Zc
-
-            # Z-parameters
-            Cinv = inv(C)
-            Z11 = A @ Cinv
-            Z12 = Z11 @ D - B
-            Z21 = Cinv
-            Z22 = Z21 @ D
-
-            # Combine Z-parameters
-            Z_params = np.block([
-                [Z11, Z12],
-                [Z21, Z22]
-            ])
-
-            # Convert to S-parameters
-            s_params[:, :, freqidx] = (Z_params - z0_matrix) @ inv(Z_params + z0_matrix)
-
-            # Store Zc and gamma
-            Zc_all[:, :, freqidx] = Zc
-            gamma_all[:, :, freqidx] = gamma
-
-        # Prepare output struct
-        rlgc_struct = {
+            D, V = np.linalg.eig(Z @ Y)
+            VinvZ = np.linalg.solve(V, Z)
+        else:
+            # V = Q·blockdiag(Vs, Va), V^-1·Z = blockdiag(Vs^-1, Va^-1)·Qᵀ·Z
+            Q, k = basis
+            QtZ = Q.T @ Z
+            ZY = QtZ @ Y @ Q
+            Ds, Vs = np.linalg.eig(ZY[:, :k, :k])
+            Da, Va = np.linalg.eig(ZY[:, k:, k:])
+            D = np.concatenate([Ds, Da], axis=1)
+            V = np.concatenate([Q[:, :k] @ Vs, Q[:, k:] @ Va], axis=2)
+            VinvZ = np.concatenate([np.linalg.solve(Vs, QtZ[:, :k]), np.linalg.solve(Va, QtZ[:, k:])], axis=1)
+        gammaEig = np.sqrt(D)  # Propagation constants
+
+        # Characteristic impedance and gamma matrices
+        W = VinvZ / gammaEig[:, :, np.newaxis]
+        Zc = V @ W
+        gamma = Zc @ Y
+
+        return V, gammaEig, W, gamma, Zc
+
+    def _propagate(self, V, gammaEig, W, length):
+        """
+        Build S-parameters of a line section from its modal decomposition.
+
+        A uniform line is reciprocal and symmetric end to end, so its Z-matrix is
+        [[Z11, Z21], [Z21, Z11]]. For even and odd port excitations it splits into
+        Ze = V·diag(coth(gamma·l/2))·W and Zo = V·diag(tanh(gamma·l/2))·W, each turned
+        into S with one N×N solve. S11 = S22 = (Se + So) / 2, S21 = S12 = (Se - So) / 2.
+
+        Args:
+            V (ndarray): Eigenvectors of Z·Y, shape (F, N, N) or (N, N).
+            gammaEig (ndarray): Modal propagation constants, shape (F, N).
+            W (ndarray): V^-1·Zc, shape (F, N, N) or (N, N).
+            length (float): Line length in meters.
+
+        Returns:
+            ndarray: S-parameters of shape (F, 2N, 2N).
+        """
+        freqpts, num_lines = gammaEig.shape
+        tanh_half = np.tanh(gammaEig * length / 2)
+
+        Ze = (V * (1 / tanh_half)[:, np.newaxis, :]) @ W
+        Zo = (V * tanh_half[:, np.newaxis, :]) @ W
+
+        # S = (Z - z0) (Z + z0)^-1 = I - 2 z0 (Z + z0)^-1
+        eye = np.broadcast_to(np.eye(num_lines), Ze.shape)
+        Se = eye - 2 * self.z0 * np.linalg.solve(Ze + self.z0 * eye, eye)
+        So = eye - 2 * self.z0 * np.linalg.solve(Zo + self.z0 * eye, eye)
+
+        s_params = np.empty((freqpts, 2 * num_lines, 2 * num_lines), dtype=complex)
+        s_params[:, :num_lines, :num_lines] = (Se + So) / 2
+        s_params[:, num_lines:, :num_lines] = (Se - So) / 2
+        s_params[:, :num_lines, num_lines:] = s_params[:, num_lines:, :num_lines]
+        s_params[:, num_lines:, num_lines:] = s_params[:, :num_lines, :num_lines]
+        return s_params
+
+    def _modal_decomposition(self, resistance, inductance, conductance, capacitance):
+        """
+        Length-independent part of the conversion: modal decomposition, Zc and gamma.
+
+        Lossless lines with constant L and C take a fast path with a single real decomposition.
+        For lossy lines modal_solver selects 'exact' (complex eig per frequency, split in two
+        halves for mirror-symmetric buses) or 'perturbation' (_decompose_perturbation).
+
+        Returns:
+            tuple: (modal, gamma, Zc) where modal = (V, gammaEig, W) is passed to _propagate
+                   and gamma, Zc have shape (F, N, N).
+        """
+        freqpts = self.freq_range.size
+        omega = 2 * np.pi * self.freq_range
+
+        if self._is_frequency_independent(resistance, inductance, conductance, capacitance):
+            # Lossless line: gammaEig = jω beta, Zc and modes do not depend on frequency
+            L, C = inductance[0], capacitance[0]
+            V, Vinv, beta = self._decompose_lossless(L, C)
+            W = (Vinv @ L) / beta[:, np.newaxis]  # V^-1 Zc = diag(1 / (jω beta)) V^-1 (jω L)
+            gammaEig = 1j * omega[:, np.newaxis] * beta[np.newaxis, :]
+            Zc = V @ W
+            gamma = 1j * omega[:, np.newaxis, np.newaxis] * (Zc @ C)
+            Zc = np.broadcast_to(Zc.astype(complex), (freqpts,) + Zc.shape)
+        else:
+            # Per-unit-length impedance and admittance
+            w = omega[:, np.newaxis, np.newaxis]
+            Z = resistance + 1j * w * inductance
+            Y = conductance + 1j * w * capacitance
+
+            if self.modal_solver == 'perturbation' and self._is_constant(inductance) and self._is_constant(capacitance):
+                V, gammaEig, W, gamma, Zc = self._decompose_perturbation(Z, Y, inductance[0], capacitance[0])
+            elif self.modal_solver in ('exact', 'perturbation'):
+                basis = None
+                if self.detect_symmetry:
+                    basis = self._symmetry_basis((resistance, inductance, conductance, capacitance))
+                V, gammaEig, W, gamma, Zc = self._decompose(Z, Y, basis)
+            else:
+                raise ValueError(f"Unknown modal solver '{self.modal_solver}', use 'exact' or 'perturbation'")
+
+        return (V, gammaEig, W), gamma, Zc
+
+    @staticmethod
+    def _rlgc_struct(resistance, inductance, conductance, capacitance, gamma, Zc):
+        """Pack RLGC and derived parameters, all frequency-major (F, N, N), into the output struct."""
+        return {
             'R': resistance,
             'L': inductance,
             'G': conductance,
             'C': capacitance,
-            'Zc': Zc_all,
-            'gamma': gamma_all
+            'Zc': Zc,
+            'gamma': gamma
+        }
+
+    def _convert_range(self, start, stop):
+        """
+        Convert frequency points [start, stop) only.
+
+        Interpolation of mR/mG is pointwise, so a slice of freq_range gives the same values as
+        the corresponding slice of a full conversion, while memory stays proportional to the slice.
+
+        Returns:
+            tuple: (s_params, gamma, Zc) of shapes (stop - start, 2N, 2N), (.., N, N), (.., N, N).
+        """
+        params = dict(self.params, freq_range=self.freq_range[start:stop], workers=1)
+        converter = RLGC2SConverter(params, self.results)
+        rlgc = converter._prepare_matrices()
+        modal, gamma, Zc = converter._modal_decomposition(*rlgc)
+        return converter._propagate(*modal, converter.length), gamma, Zc
+
+    def _use_workers(self):
+        """Check whether the conversion is large enough to be split between worker processes."""
+        return (self.workers is not None and self.workers > 1
+                and self.freq_range.size >= self.parallel_min_points)
+
+    def _convert_parallel(self):
+        """
+        Convert frequency chunks in a process pool.
+
+        Workers write S, gamma and Zc straight into shared-memory tensors, so only the small
+        params/results dictionaries are pickled; the tensors are copied out once at the end.
+
+        Returns:
+            tuple: (s_params, gamma, Zc) of shapes (F, 2N, 2N), (F, N, N), (F, N, N).
+        """
+        freqpts = self.freq_range.size
+        num_lines = self.num_lines
+        shapes = {
+            's_params': (freqpts, 2 * num_lines, 2 * num_lines),
+            'gamma': (freqpts, num_lines, num_lines),
+            'Zc': (freqpts, num_lines, num_lines),
         }
+        itemsize = np.dtype(complex).itemsize
+        shms = {}
+        try:
+            for key, shape in shapes.items():
+                shms[key] = SharedMemory(create=True, size=int(np.prod(shape)) * itemsize)
+            buffers = {key: (shms[key].name, shape) for key, shape in shapes.items()}
+
+            # A few chunks per worker to balance the load
+            bounds = np.linspace(0, freqpts, 4 * self.workers + 1).astype(int)
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                futures = [pool.submit(_convert_worker, self.params, self.results, buffers, start, stop)
+                           for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+                for future in futures:
+                    future.result()
+
+            out = tuple(np.ndarray(shapes[key], dtype=complex, buffer=shms[key].buf).copy()
+                        for key in ('s_params', 'gamma', 'Zc'))
+        finally:
+            for shm in shms.values():
+                shm.close()
+                shm.unlink()
+        return out
+
+    def _convert_compact(self, chunk_size=1024):
+        """
+        Convert chunk by chunk in double precision and keep the results in compact storage.
+
+        S and Zc of a reciprocal line are symmetric and are stored as upper triangles in
+        compact_dtype. gamma = Zc·Y is not symmetric for coupled lines, so it is kept as full
+        matrices, only in compact_dtype.
+
+        Returns:
+            tuple: (s_params, gamma, Zc) with s_params, Zc as PackedSymmetric and gamma of shape (F, N, N).
+        """
+        freqpts = self.freq_range.size
+        s_params = PackedSymmetric.empty(freqpts, 2 * self.num_lines, self.compact_dtype)
+        Zc = PackedSymmetric.empty(freqpts, self.num_lines, self.compact_dtype)
+        gamma = np.empty((freqpts, self.num_lines, self.num_lines), dtype=self.compact_dtype)
+        for start in range(0, freqpts, chunk_size):
+            stop = min(start + chunk_size, freqpts)
+            s_chunk, gamma[start:stop], Zc_chunk = self._convert_range(start, stop)
+            s_params.fill(start, stop, s_chunk)
+            Zc.fill(start, stop, Zc_chunk)
+        return s_params, gamma, Zc
+
+    def convert(self):
+        """
+        Convert RLGC parameters to S-parameters.
+
+        All frequency points are processed at once as stacked (F, N, N) matrices. With
+        params['workers'] > 1 and at least parallel_min_points frequencies, the frequency
+        axis is split into chunks converted in a process pool. With params['storage'] set to
+        'compact', S and Zc are returned as PackedSymmetric (unpacked on demand by np.asarray).
+
+        Returns:
+            tuple: (s_params, rlgc_struct) where s_params is the contiguous S-parameter tensor
+                   of shape (F, 2N, 2N), as used by skrf.Network, and rlgc_struct contains
+                   RLGC and derived parameters of shape (F, N, N).
+        """
+        # self._validate_inputs()
+        rlgc = self._prepare_matrices()
+        if self.storage == 'compact':
+            s_params, gamma, Zc = self._convert_compact()
+            return s_params, self._rlgc_struct(*rlgc, gamma, Zc)
+        if self.storage != 'full':
+            raise ValueError(f"Unknown storage '{self.storage}', use 'full' or 'compact'")
+
+        if self._use_workers():
+            s_params, gamma, Zc = self._convert_parallel()
+        else:
+            modal, gamma, Zc = self._modal_decomposition(*rlgc)
+            s_params = self._propagate(*modal, self.length)
+
+        return s_params, self._rlgc_struct(*rlgc, gamma, Zc)
+
+    def convert_lengths(self, lengths):
+        """
+        Convert RLGC parameters to S-parameters for several line lengths at once.
+
+        The modal decomposition depends only on the per-unit-length RLGC, so it is done once
+        and only the hyperbolic terms are re-evaluated for each length.
+
+        Args:
+            lengths (array_like): Line lengths in meters.
+
+        Returns:
+            tuple: (s_params, rlgc_struct) where s_params has shape (L, F, 2N, 2N).
+        """
+        lengths = np.atleast_1d(np.asarray(lengths, dtype=float))
+        rlgc = self._prepare_matrices()
+        modal, gamma, Zc = self._modal_decomposition(*rlgc)
+
+        num_ports = 2 * self.num_lines
+        s_params = np.empty((lengths.size, self.freq_range.size, num_ports, num_ports), dtype=complex)
+        for idx, length in enumerate(lengths):
+            s_params[idx] = self._propagate(*modal, length)
+
+        return s_params, self._rlgc_struct(*rlgc, gamma, Zc)
+
+    def iter_convert(self, chunk_size=1024):
+        """
+        Convert RLGC parameters to S-parameters chunk by chunk.
+
+        Only one chunk of RLGC and S data is held in memory at a time.
+
+        Args:
+            chunk_size (int): Number of frequency points per chunk.
+
+        Yields:
+            tuple: (freqs, s_params) with freqs of shape (K,) and s_params of shape (K, 2N, 2N).
+        """
+        for start in range(0, self.freq_range.size, chunk_size):
+            stop = min(start + chunk_size, self.freq_range.size)
+            s_params, _, _ = self._convert_range(start, stop)
+            yield self.freq_range[start:stop], s_params
+
+    def stream_to_snp(self, filename='output.s2p', chunk_size=1024):
+        """
+        Convert and write S-parameters to a snp Touchstone file as the chunks are produced.
+
+        Args:
+            filename (str): Output file name; the extension is fixed to .s<2N>p.
+            chunk_size (int): Number of frequency points per chunk.
+        """
+        n_ports = 2 * self.num_lines
+        expected_ext = f'.s{n_ports}p'
+        if not filename.endswith(expected_ext):
+            print(f"Предупреждение: ожидалось расширение {expected_ext}, получено {filename}")
+            filename = filename.rsplit('.', 1)[0] + expected_ext
+
+        with TouchstoneWriter(filename, n_ports, z0=self.z0) as writer:
+            for freqs, s_params in self.iter_convert(chunk_size):
+                writer.write(freqs, s_params)
 
-        return s_params, rlgc_struct
+        print(f"Файл {filename} успешно сохранён")
 
     def save_to_snp(self, s_params, filename='output.s2p'):
         """
-        Save S-parameters to a snp Touchstone file
+        Save S-parameters of shape (F, n_ports, n_ports) to a snp Touchstone file
         """
-        n_ports = s_params.shape[0]
-        if s_params.shape[0] != s_params.shape[1]:
+        s_params = np.asarray(s_params)
+        n_ports = s_params.shape[1]
+        if s_params.shape[1] != s_params.shape[2]:
             raise ValueError(f"S-параметры должны быть квадратной матрицей, получено: {s_params.shape}")
 
         expected_ext = f'.s{n_ports}p'
@@ -172,9 +561,32 @@ class RLGC2SConverter:
             print(f"Предупреждение: ожидалось расширение {expected_ext}, получено {filename}")
             filename = filename.rsplit('.', 1)[0] + expected_ext
 
-        s = np.moveaxis(s_params, 2, 0)
         frequency = skrf.Frequency.from_f(self.freq_range, unit='Hz')
-        ntw = skrf.Network(frequency=frequency, s=s, name=filename.replace(expected_ext, ''))
+        ntw = skrf.Network(frequency=frequency, s=s_params, z0=self.z0, name=filename.replace(expected_ext, ''))
         ntw.write_touchstone(filename=filename.replace(expected_ext, ''))
 
-        print(f"Файл {filename} успешно сохранён")
\ No newline at end of file
+        print(f"Файл {filename} успешно сохранён")
+
+
+def _convert_worker(params, results, buffers, start, stop):
+    """
+    Convert frequency points [start, stop) and write them into shared-memory tensors.
+
+    Args:
+        params (dict): Converter params.
+        results (list): TALGAT results as passed to RLGC2SConverter.
+        buffers (dict): {'s_params' | 'gamma' | 'Zc': (shared memory name, full tensor shape)}.
+        start (int): First frequency index of the chunk.
+        stop (int): End frequency index of the chunk (exclusive).
+    """
+    s_params, gamma, Zc = RLGC2SConverter(params, results)._convert_range(start, stop)
+    chunk = {'s_params': s_params, 'gamma': gamma, 'Zc': Zc}
+
+    for key, (name, shape) in buffers.items():
+        shm = SharedMemory(name=name)
+        try:
+            target = np.ndarray(shape, dtype=complex, buffer=shm.buf)
+            target[start:stop] = chunk[key]
+            del target
+        finally:
+            shm.close()
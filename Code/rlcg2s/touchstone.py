@@ -0,0 +1,70 @@
+import numpy as np
+
+
+class TouchstoneWriter:
+    """Class to write a Touchstone v1 snp file incrementally, one frequency chunk at a time."""
+
+    def __init__(self, filename, n_ports, z0=50.0, comments=None):
+        """
+        Open the file and write the option line.
+
+        Args:
+            filename (str): Path of the .snp file.
+            n_ports (int): Number of ports.
+            z0 (float): Reference impedance in Ohms, default 50.0.
+            comments (list, optional): Comment lines written to the header.
+        """
+        self.filename = filename
+        self.n_ports = n_ports
+        self.file = open(filename, 'w', encoding='utf-8')
+        for line in comments or []:
+            self.file.write(f'! {line}\n')
+        self.file.write(f'# Hz S RI R {z0}\n')
+        self._fmt = self._build_format(n_ports)
+
+    @staticmethod
+    def _build_format(n_ports, fmt='%.12e'):
+        """
+        Build the %-format of one frequency record.
+
+        Up to 2 ports all values share one line; otherwise every matrix row starts
+        a new line with at most 4 complex values per line.
+        """
+        if n_ports <= 2:
+            return ' '.join([fmt] * (1 + 2 * n_ports ** 2)) + '\n'
+        lines = []
+        for row in range(n_ports):
+            for start in range(0, n_ports, 4):
+                count = min(4, n_ports - start)
+                prefix = fmt + ' ' if row == 0 and start == 0 else ' ' * 20
+                lines.append(prefix + ' '.join([fmt] * (2 * count)))
+        return '\n'.join(lines) + '\n'
+
+    def write(self, freqs, s_params):
+        """
+        Append a chunk of frequency points.
+
+        Args:
+            freqs (ndarray): Frequencies in Hz, shape (K,).
+            s_params (ndarray): S-parameters of shape (K, n_ports, n_ports).
+        """
+        s_params = np.asarray(s_params)
+        if self.n_ports == 2:
+            # Two-port data is written column-wise: S11 S21 S12 S22
+            s_params = np.swapaxes(s_params, 1, 2)
+        values = s_params.reshape(len(freqs), -1)
+        records = np.empty((len(freqs), 1 + 2 * values.shape[1]))
+        records[:, 0] = freqs
+        records[:, 1::2] = values.real
+        records[:, 2::2] = values.imag
+        self.file.write(''.join(self._fmt % tuple(record) for record in records))
+
+    def close(self):
+        """Close the file."""
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
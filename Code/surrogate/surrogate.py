@@ -0,0 +1,208 @@
+import os
+import numpy as np
+from scipy.interpolate import RBFInterpolator
+from scipy.spatial import cKDTree
+from scipy.stats import qmc
+from talgat.rlgccache import MATRIX_KEYS, make_key
+
+
+def _length(value) -> int:
+    """Number of entries of a list-valued parameter, 0 for a scalar."""
+    return len(value) if isinstance(value, (list, tuple, np.ndarray)) else 0
+
+
+def _sample_value(base, value):
+    """A list-valued parameter (e.g. MNLIN W, S) is varied as a whole: every entry set to value."""
+    if _length(base):
+        return [float(value)] * _length(base)
+    return float(value)
+
+
+def _pack(result: dict, n: int) -> np.ndarray:
+    """Upper triangles of mL, mC and of mR, mG (N, N, F0) as one vector."""
+    rows, cols = np.triu_indices(n)
+    return np.concatenate([np.asarray(result[k], dtype=float)[rows, cols].ravel() for k in MATRIX_KEYS])
+
+
+class RLGCSurrogate:
+    """
+    Class for a table of TALGAT RLGC results over a design space, answering queries by interpolation.
+
+    The table holds per-unit-length mL, mC (upper triangles) and mR, mG (upper triangles at every
+    f0) of one structure script for samples of a space-filling (Sobol) design of the varied
+    parameters; all other solve parameters are fixed and hashed into the table key. Queries are
+    interpolated with a thin-plate-spline RBF in the normalized design space. The error estimate
+    is built from leave-one-out errors of the samples, weighted by inverse squared distance.
+    """
+
+    def __init__(self, names, bounds, samples, values, loo_errors, n, f0, key, lengths=None):
+        """
+        Args:
+            names (list): Varied parameter names.
+            bounds (ndarray): Lower and upper bound of each varied parameter, shape (D, 2).
+            samples (ndarray): Design points, shape (S, D), in parameter units.
+            values (ndarray): Packed RLGC of each sample, shape (S, M), see _pack.
+            loo_errors (ndarray): Leave-one-out relative error of each sample, shape (S,).
+            n (int): Number of conductors.
+            f0 (ndarray): Frequencies of mR, mG; empty for lossless tables, whose mR, mG hold one
+                zero column.
+            key (str): Hash of the fixed parameters, script and shared code.
+            lengths (ndarray, optional): Entries of each varied list-valued parameter, 0 for scalars.
+        """
+        self.names = list(names)
+        self.bounds = np.asarray(bounds, dtype=float)
+        self.samples = np.asarray(samples, dtype=float)
+        self.values = np.asarray(values, dtype=float)
+        self.loo_errors = np.asarray(loo_errors, dtype=float)
+        self.n = int(n)
+        self.f0 = np.asarray(f0, dtype=float)
+        self.key = key
+        self.lengths = np.zeros(len(self.names), dtype=int) if lengths is None else np.asarray(lengths, dtype=int)
+        self._rows, self._cols = np.triu_indices(self.n)
+        # Columns of mR, mG per entry, from the packed size: 2 * m for mL, mC plus 2 * m * depth
+        self._depth = (self.values.shape[1] // len(self._rows) - 2) // 2
+        # Constant outputs (e.g. zero mR, mG of lossless tables) keep unit scale
+        self._scale = np.std(self.values, axis=0)
+        self._scale[self._scale == 0] = 1.0
+        self._tree = cKDTree(self._normalize(self.samples))
+        self._interpolator = self._fit(np.arange(len(self.samples)))
+
+    @staticmethod
+    def fixed_key(script_code: str, shared_code: str, params: dict, names) -> str:
+        """Hash of everything a table depends on except the values of the varied parameters; for
+        those only the number of entries (e.g. lines of an MNLIN bus) enters the key."""
+        return make_key(script_code, shared_code, {k: {"length": _length(v)} if k in names else v
+                                                   for k, v in params.items()})
+
+    def _normalize(self, points):
+        return (np.asarray(points, dtype=float) - self.bounds[:, 0]) / (self.bounds[:, 1] - self.bounds[:, 0])
+
+    def _fit(self, index):
+        return RBFInterpolator(self._normalize(self.samples[index]), self.values[index] / self._scale,
+                               kernel="thin_plate_spline", degree=1)
+
+    def _blocks(self):
+        """(start, size) of the packed mL, mC, mR and mG."""
+        m, f = len(self._rows), len(self._rows) * self._depth
+        return (0, m), (m, m), (2 * m, f), (2 * m + f, f)
+
+    def _unpack(self, packed: np.ndarray) -> dict:
+        result = {}
+        for k, (start, size) in zip(MATRIX_KEYS, self._blocks()):
+            shape = (self.n, self.n) if k in ("mL", "mC") else (self.n, self.n, self._depth)
+            matrix = np.empty(shape)
+            matrix[self._rows, self._cols] = packed[start:start + size].reshape((len(self._rows),) + shape[2:])
+            matrix[self._cols, self._rows] = matrix[self._rows, self._cols]
+            result[k] = matrix
+        if len(self.f0):
+            result["f0"] = self.f0
+        return result
+
+    @classmethod
+    def build(cls, solve, script_code: str, shared_code: str, base_params: dict, ranges: dict,
+              n_samples: int = 64, seed: int = 0, key_params: dict = None):
+        """
+        Build a table by solving a scrambled Sobol design of the varied parameters.
+
+        Args:
+            solve (callable): list of parameter dicts -> list of TALGAT results (as TalgatSession.run_batch).
+            script_code (str): Structure script.
+            shared_code (str): shared.py source.
+            base_params (dict): Full parameters; the varied ones are replaced per sample. Adaptive
+                f0 is switched off, so that every sample has the same f0.
+            ranges (dict): Varied parameter name -> (low, high).
+            n_samples (int): Number of design points, rounded up to a power of two.
+            seed (int): Seed of the scrambled design.
+            key_params (dict, optional): Parameters the table key is taken from, default base_params;
+                e.g. the parameters before the mesh convergence replaced seg_cond, seg_diel.
+
+        Returns:
+            RLGCSurrogate: Table of the successfully solved samples.
+        """
+        base_params = dict(base_params, f0_tol=None)
+        names = list(ranges)
+        bounds = np.array([ranges[name] for name in names], dtype=float)
+        sampler = qmc.Sobol(len(names), scramble=True, seed=seed)
+        unit = sampler.random_base2(int(np.ceil(np.log2(max(n_samples, 2)))))
+        samples = qmc.scale(unit, bounds[:, 0], bounds[:, 1])
+        param_list = [dict(base_params, **{name: _sample_value(base_params[name], value)
+                                           for name, value in zip(names, sample)})
+                      for sample in samples]
+        results = solve(param_list)
+        ok = [i for i, result in enumerate(results) if "error" not in result]
+        if len(ok) < len(names) + 2:
+            raise RuntimeError(f"Only {len(ok)} of {len(samples)} surrogate samples solved")
+        first = results[ok[0]]["result"]
+        n = len(first["mL"])
+        f0 = np.asarray(first.get("f0", base_params["f0"]), dtype=float)
+        if not base_params.get("loss"):
+            # CalMat returns the requested f0 with a single zero mR, mG column
+            f0 = np.array([])
+        key = cls.fixed_key(script_code, shared_code, dict(key_params or base_params, f0_tol=None), names)
+
+        values = np.array([_pack(results[i]["result"], n) for i in ok])
+        lengths = [_length(base_params[name]) for name in names]
+        table = cls(names, bounds, samples[ok], values, np.zeros(len(ok)), n, f0, key, lengths)
+        table.loo_errors = table._leave_one_out()
+        return table
+
+    def _leave_one_out(self) -> np.ndarray:
+        """Max-abs error of every sample predicted from all others, relative to the largest value of its block."""
+        index = np.arange(len(self.samples))
+        errors = np.empty(len(index))
+        for i in index:
+            rest = index != i
+            predicted = self._fit(index[rest])(self._normalize(self.samples[i:i + 1]))[0] * self._scale
+            errors[i] = self._relative_error(predicted, self.values[i])
+        return errors
+
+    def _relative_error(self, predicted, exact) -> float:
+        """Largest error of the L, C, R and G blocks, each relative to its largest entry."""
+        worst = 0.0
+        for start, size in self._blocks():
+            scale = np.max(np.abs(exact[start:start + size]))
+            if scale > 0:
+                worst = max(worst, np.max(np.abs(predicted[start:start + size] - exact[start:start + size])) / scale)
+        return float(worst)
+
+    def query(self, params: dict):
+        """
+        Interpolate the RLGC matrices at the varied parameter values of params.
+
+        The table only covers list-valued parameters with all entries equal, as they were solved
+        (see _sample_value); other points get an infinite error estimate.
+
+        Returns:
+            tuple: (result dict with mL, mC, mR, mG, f0 as from CalMat, estimated relative error,
+                True if the point lies inside the table bounds).
+        """
+        for name, length in zip(self.names, self.lengths):
+            value = params[name]
+            if _length(value) != length or (length and np.ptp(np.asarray(value, dtype=float)) != 0):
+                return None, np.inf, False
+        point = np.array([np.ravel(params[name])[0] for name in self.names], dtype=float)
+        x = self._normalize(point[np.newaxis])
+        inside = bool(np.all((x >= 0) & (x <= 1)))
+        packed = self._interpolator(x)[0] * self._scale
+        distances, neighbours = self._tree.query(x[0], k=min(4, len(self.samples)))
+        distances, neighbours = np.atleast_1d(distances), np.atleast_1d(neighbours)
+        if distances[0] == 0:
+            error = 0.0
+        else:
+            weights = 1 / distances ** 2
+            error = float(np.sum(weights * self.loo_errors[neighbours]) / np.sum(weights))
+        return self._unpack(packed), error, inside
+
+    def save(self, path: str):
+        """Store the table as a compressed npz file."""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        np.savez_compressed(path, names=np.array(self.names), bounds=self.bounds, samples=self.samples,
+                            values=self.values, loo_errors=self.loo_errors, n=self.n, f0=self.f0,
+                            key=np.array(self.key), lengths=self.lengths)
+
+    @classmethod
+    def load(cls, path: str):
+        with np.load(path) as data:
+            return cls([str(name) for name in data["names"]], data["bounds"], data["samples"], data["values"],
+                       data["loo_errors"], int(data["n"]), data["f0"], str(data["key"]),
+                       data["lengths"] if "lengths" in data.files else None)
@@ -1,21 +1,24 @@
 D0 = [ER0, MU0, TD0]
 D1 = [ER1, MU1, TD1]
 
-SET_INFINITE_GROUND(1)
-SET_AUTO_SEGMENT_LENGTH_DIELECTRIC(T / seg_diel)
-SET_AUTO_SEGMENT_LENGTH_CONDUCTOR(T / seg_cond)
+# Drawn only when the session does not hold this cross-section yet, see resident_configuration
+def build_geometry():
+    SET_INFINITE_GROUND(1)
+    SET_AUTO_SEGMENT_LENGTH_DIELECTRIC(T / seg_diel)
+    SET_AUTO_SEGMENT_LENGTH_CONDUCTOR(T / seg_cond)
 
-CC1 = []
-D = 2 * W[0]
+    CC1 = []
+    D = 2 * W[0]
 
-for i in range(len(S)):
-    CC1.append(cond(D, H, W[i], T, D1, D0, True, False))
-    D = D + S[i] + W[i]
-    print(S[i])
-CC1.append(cond(D, H, W[-1], T, D1, D0, True, False))
-diel1(CC1, H, D1, D0)
+    for i in range(len(S)):
+        CC1.append(cond(D, H, W[i], T, D1, D0, True, False))
+        D = D + S[i] + W[i]
+        print(S[i])
+    CC1.append(cond(D, H, W[-1], T, D1, D0, True, False))
+    diel1(CC1, H, D1, D0)
+    return GET_CONFIGURATION_2D()
 
-conf = GET_CONFIGURATION_2D()
-result = CalMat(conf, f0, loss=loss, sigma=sigma)
-ECHO()
-ECHO(json.dumps(result))
\ No newline at end of file
+
+conf = resident_configuration(build_geometry)
+result = CalMat(conf, f0, loss=loss, sigma=sigma, **solve_options())
+send_result(result)
\ No newline at end of file
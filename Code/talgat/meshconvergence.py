@@ -0,0 +1,124 @@
+import json
+import os
+import tempfile
+import numpy as np
+from talgat.rlgccache import make_key
+
+
+def _relative_change(new, old):
+    new, old = np.asarray(new, dtype=float), np.asarray(old, dtype=float)
+    return float(np.max(np.abs(new - old)) / np.max(np.abs(new)))
+
+
+class MeshConvergence:
+    """
+    Class to find and remember the coarsest converged TALGAT segmentation.
+
+    The conductor and dielectric segment lengths are T / seg_cond and T / seg_diel. Both are
+    refined together by a constant factor until the per-unit-length L and C change by less than
+    the tolerance; the coarser of the last two settings is recorded in a JSON file per structure
+    and substrate, and reused by later runs.
+
+    The segment lengths scale with the conductor thickness T, so a setting converged for one line
+    geometry (W, S) is reused for every other geometry of the structure on the same substrate. The
+    record key holds the structure script, shared.py and the substrate parameters (T, H, ER*, ...),
+    not the line geometry, so a sweep runs one convergence study, not one per point.
+    """
+
+    def __init__(self, path: str, substrate_keys=()):
+        """
+        Args:
+            path (str): JSON file with the converged settings, created on first store.
+            substrate_keys (iterable): Parameter names of the substrate (e.g. the keys of
+                config.SUBSTRATES["MSUB"]), whose values are part of the record key.
+        """
+        self.path = path
+        self.substrate_keys = tuple(substrate_keys)
+
+    def _load(self) -> dict:
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _store(self, key: str, record: dict):
+        records = self._load()
+        records[key] = record
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        # Write to a temporary file first so that readers never see a partial file
+        with tempfile.NamedTemporaryFile("w", delete=False, dir=directory, suffix=".json", encoding="utf-8") as tmp:
+            json.dump(records, tmp, indent=2)
+        os.replace(tmp.name, self.path)
+
+    def make_key(self, script_code: str, shared_code: str, params: dict) -> str:
+        substrate = {k: params[k] for k in self.substrate_keys if k in params}
+        return make_key(script_code, shared_code, dict(substrate, substrate_name=params.get("SUBSTRATE")))
+
+    def get(self, script_code: str, shared_code: str, params: dict, tol: float = None):
+        """Return the recorded {"seg_cond", "seg_diel", ...} for this cross-section, or None if there
+        is none or it was converged to a looser tolerance than tol."""
+        record = self._load().get(self.make_key(script_code, shared_code, params))
+        if record is None or (tol is not None and record["tol"] > tol):
+            return None
+        if not record["converged"]:
+            print(f"Warning, reusing segmentation of '{record['structure']}' that did not converge to {record['tol']}")
+        return record
+
+    def converge(self, session, struct_name: str, params: dict, script_code: str, shared_code: str,
+                 tol: float = 1e-3, refine: float = 1.5, max_steps: int = 8, timeout=None) -> dict:
+        """
+        Refine the segmentation until L and C converge and record the result.
+
+        Args:
+            session (TalgatSession): Session with shared.py loaded.
+            struct_name (str): Structure name, stored in the record for reference.
+            params (dict): Full run parameters; seg_cond, seg_diel are the starting (coarsest) setting.
+                The study runs at the line geometry of params.
+            script_code (str): Structure script.
+            shared_code (str): shared.py source, part of the record key.
+            tol (float): Relative max-abs change of L and C between two refinements.
+            refine (float): Factor applied to seg_cond and seg_diel at every step.
+            max_steps (int): Maximum number of solves.
+            timeout (float, optional): Seconds per solve.
+
+        Returns:
+            dict: Record with seg_cond, seg_diel, change, converged and steps.
+        """
+        seg_cond, seg_diel = params["seg_cond"], params["seg_diel"]
+        previous = None
+        record = None
+        for step in range(max_steps):
+            # L and C are all the segmentation check needs, so skip the lossy R/G solves
+            run_params = dict(params, seg_cond=seg_cond, seg_diel=seg_diel, loss=False, f0_tol=None)
+            result = session.run_script(run_params, script_code, timeout=timeout)
+            if "error" in result:
+                raise RuntimeError(f"Mesh convergence of '{struct_name}' failed at seg_cond={seg_cond}, "
+                                   f"seg_diel={seg_diel}: {result['error']}")
+            current = result["result"]
+            if previous is not None:
+                change = max(_relative_change(current["mL"], previous["mL"]),
+                             _relative_change(current["mC"], previous["mC"]))
+                print(f"[MeshConvergence] {struct_name}: seg_cond={seg_cond:.3g}, seg_diel={seg_diel:.3g}, "
+                      f"L/C change {change:.2e}")
+                record = {
+                    "seg_cond": seg_cond / refine,
+                    "seg_diel": seg_diel / refine,
+                    "change": change,
+                    "converged": change < tol,
+                    "steps": step + 1,
+                }
+                if change < tol:
+                    break
+            previous = current
+            seg_cond, seg_diel = seg_cond * refine, seg_diel * refine
+
+        if record is None:
+            raise ValueError("Mesh convergence needs max_steps >= 2")
+        if not record["converged"]:
+            # Use the finest setting solved rather than one known to be off by more than tol
+            record.update(seg_cond=seg_cond / refine, seg_diel=seg_diel / refine)
+            print(f"Warning, segmentation of '{struct_name}' not converged to {tol} in {max_steps} steps")
+        record.update(structure=struct_name, substrate=params.get("SUBSTRATE"), tol=tol)
+        self._store(self.make_key(script_code, shared_code, params), record)
+        return record
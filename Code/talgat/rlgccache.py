@@ -0,0 +1,167 @@
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+import numpy as np
+
+# Parameters that do not change the 2D cross-section solve and are left out of the cache key
+POSTPROCESS_KEYS = frozenset({
+    # line and S-parameter conversion
+    "length", "freq_range", "Z0",
+    "interp_R", "interp_G", "modal_solver", "detect_symmetry",
+    "workers", "parallel_min_points", "storage", "compact_dtype",
+    "ds_er", "ds_td", "ds_fref", "ds_f1", "ds_f2",
+    # vector fitting
+    "do_vector_fitting", "vf_params",
+    # resolved into seg_cond / seg_diel before the solve
+    "mesh_tol",
+    # surrogate lookup threshold
+    "surrogate_tol",
+    # config bookkeeping, the substrate values themselves are part of the parameters
+    "MODELTYPE", "SIMULATION", "SUBSTRATE",
+})
+
+# Parameters only used after the SMN matrix fill, i.e. by CALCULATE_R / CALCULATE_CG
+SOLVE_ONLY_KEYS = frozenset({"f0", "loss", "sigma", "f0_tol", "f0_max_points", "rlgc_model"})
+
+# Optional solve settings; always sent (and hashed) with their defaults, because a warm session
+# keeps the globals of earlier requests
+SOLVE_DEFAULTS = {"f0_tol": None, "f0_max_points": 17, "f0_range": None, "interp": None, "rlgc_model": "interpolate"}
+
+MATRIX_KEYS = ("mL", "mC", "mR", "mG")
+# Stored when present, e.g. f0 chosen by the adaptive f0 mode
+OPTIONAL_KEYS = ("f0",)
+
+
+def canonical_value(value):
+    """Convert a parameter value to a JSON-serializable form that hashes the same for equal values."""
+    if isinstance(value, np.ndarray):
+        return [canonical_value(v) for v in value.tolist()]
+    if isinstance(value, (list, tuple)):
+        return [canonical_value(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): canonical_value(v) for k, v in value.items()}
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float):
+        return float(repr(value))
+    return value
+
+
+def solve_params(params: dict) -> dict:
+    """Return the parameters that affect the TALGAT solve, with the defaults of SOLVE_DEFAULTS filled in."""
+    solve = dict(SOLVE_DEFAULTS, **{k: v for k, v in params.items() if k not in POSTPROCESS_KEYS})
+    if params.get("loss") and params.get("f0_tol") is not None:
+        # Adaptive f0 covers the freq_range bounds and checks the converter's interpolation
+        solve["f0_range"] = [float(np.min(params["freq_range"])), float(np.max(params["freq_range"]))]
+        solve["interp"] = [params.get("interp_R", "linear"), params.get("interp_G", "linear")]
+    return solve
+
+
+def make_key(script_code: str, shared_code: str, params: dict) -> str:
+    """
+    Hash a TALGAT run.
+
+    Args:
+        script_code (str): Structure script source.
+        shared_code (str): shared.py source.
+        params (dict): Run parameters; post-processing keys (POSTPROCESS_KEYS) are ignored.
+
+    Returns:
+        str: SHA-256 hex digest.
+    """
+    canonical = json.dumps({
+        "script": script_code,
+        "shared": shared_code,
+        "params": canonical_value(solve_params(params)),
+    }, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def geometry_key(script_code: str, params: dict) -> str:
+    """Hash of the cross-section, i.e. of everything the configuration and its SMN matrices depend on."""
+    return make_key(script_code, "", {k: v for k, v in params.items() if k not in SOLVE_ONLY_KEYS})
+
+
+class RLGCCache:
+    """
+    Class for a persistent, size-bounded cache of TALGAT RLGC results.
+
+    Entries are stored in one SQLite database as compressed npz blobs of mL/mC/mR/mG and evicted
+    least recently used first. The database runs in WAL mode, so several processes may read and
+    write it at the same time.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 512 * 2 ** 20):
+        """
+        Open or create the cache.
+
+        Args:
+            path (str): Path of the SQLite database file.
+            max_bytes (int): Upper bound of the stored blob size, default 512 MB.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS rlgc ("
+                "key TEXT PRIMARY KEY, data BLOB NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS rlgc_last_used ON rlgc (last_used)")
+
+    @contextmanager
+    def _connect(self):
+        """Connection that commits on success, rolls back on error and is always closed."""
+        db = sqlite3.connect(self.path, timeout=60.0)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    @staticmethod
+    def _pack(result: dict) -> bytes:
+        buffer = io.BytesIO()
+        keys = MATRIX_KEYS + tuple(k for k in OPTIONAL_KEYS if k in result)
+        np.savez_compressed(buffer, **{k: np.asarray(result[k], dtype=float) for k in keys})
+        return buffer.getvalue()
+
+    @staticmethod
+    def _unpack(data: bytes) -> dict:
+        with np.load(io.BytesIO(data)) as npz:
+            return {k: npz[k] for k in npz.files}
+
+    def get(self, key: str):
+        """Return the cached result dictionary (mL, mC, mR, mG and optionally f0 arrays) or None."""
+        with self._connect() as db:
+            row = db.execute("SELECT data FROM rlgc WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            db.execute("UPDATE rlgc SET last_used = ? WHERE key = ?", (time.time(), key))
+        return self._unpack(row[0])
+
+    def put(self, key: str, result: dict):
+        """Store a result dictionary and evict least recently used entries above max_bytes."""
+        data = self._pack(result)
+        with self._connect() as db:
+            # Take the write lock up front so that concurrent writers evict consistently
+            db.execute("BEGIN IMMEDIATE")
+            db.execute("INSERT OR REPLACE INTO rlgc (key, data, size, last_used) VALUES (?, ?, ?, ?)",
+                       (key, data, len(data), time.time()))
+            total = db.execute("SELECT COALESCE(SUM(size), 0) FROM rlgc").fetchone()[0]
+            if total > self.max_bytes:
+                for old_key, size in db.execute("SELECT key, size FROM rlgc ORDER BY last_used").fetchall():
+                    if total <= self.max_bytes:
+                        break
+                    if old_key != key:
+                        db.execute("DELETE FROM rlgc WHERE key = ?", (old_key,))
+                        total -= size
+
+    def clear(self):
+        with self._connect() as db:
+            db.execute("DELETE FROM rlgc")
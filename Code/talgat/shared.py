@@ -1,11 +1,122 @@
 register_talgat_commands()
 INCLUDE("MATRIX")
 INCLUDE("MOM2D")
+import base64
+import io
 import json
 import numpy as np
 import os
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
 from numpy import array
 
+# Set by TalgatSession before every request, see send_result and resident_configuration
+_REQUEST_ID = 0
+GEOMETRY_KEY = None
+RESIDENT_SIZE = 4
+
+# Configurations and their SMN matrices kept between requests: GEOMETRY_KEY -> {"conf", "smn"}
+_RESIDENT = OrderedDict()
+FRAME_MARK = "@@TALGAT@@"
+
+# Per-request instrumentation returned as result["timings"], reset by TalgatSession before every run
+_TIMINGS = {}
+
+
+def reset_timings():
+    _TIMINGS.clear()
+    _TIMINGS.update(phases={}, unknowns={}, resident=False,
+                    start_wall=time.perf_counter(), start_cpu=time.process_time())
+
+
+def _peak_memory():
+    """Peak resident memory of the solver process in bytes, None if it can't be determined."""
+    try:
+        import resource
+        # ru_maxrss is in kilobytes on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except ImportError:
+        pass
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD)] + \
+                       [(name, ctypes.c_size_t) for name in (
+                           "PeakWorkingSetSize", "WorkingSetSize", "QuotaPeakPagedPoolUsage", "QuotaPagedPoolUsage",
+                           "QuotaPeakNonPagedPoolUsage", "QuotaNonPagedPoolUsage", "PagefileUsage", "PeakPagefileUsage")]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return counters.PeakWorkingSetSize
+    except (ImportError, AttributeError, OSError):
+        pass
+    return None
+
+
+@contextmanager
+def phase(name):
+    """Add the wall and CPU time of the enclosed block to phase name of the current timings."""
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        yield
+    finally:
+        entry = _TIMINGS.setdefault("phases", {}).setdefault(name, {"wall": 0.0, "cpu": 0.0, "calls": 0})
+        entry["wall"] += time.perf_counter() - wall
+        entry["cpu"] += time.process_time() - cpu
+        entry["calls"] += 1
+
+
+def _count_unknowns(kind, smn):
+    """MoM unknowns of an SMN matrix, i.e. its size: conductor segments for L, all segments for C/CG."""
+    try:
+        _TIMINGS.setdefault("unknowns", {})[kind] = int(GET_MATRIX_ROWS(smn))
+    except Exception:
+        pass
+
+
+def collect_timings():
+    """Finish the current timings: totals since reset_timings and peak memory."""
+    timings = {k: v for k, v in _TIMINGS.items() if not k.startswith("start_")}
+    if "start_wall" in _TIMINGS:
+        timings["total"] = {"wall": time.perf_counter() - _TIMINGS["start_wall"],
+                            "cpu": time.process_time() - _TIMINGS["start_cpu"]}
+    timings["peak_memory"] = _peak_memory()
+    return timings
+
+
+def _encode_value(value, binary):
+    """Arrays become {"__npy__": base64 .npy blob} with binary=True, nested lists otherwise."""
+    if isinstance(value, np.ndarray):
+        if not binary:
+            return value.tolist()
+        buffer = io.BytesIO()
+        np.save(buffer, np.ascontiguousarray(value), allow_pickle=False)
+        return {"__npy__": base64.b64encode(buffer.getvalue()).decode("ascii")}
+    if isinstance(value, dict):
+        return {k: _encode_value(v, binary) for k, v in value.items()}
+    return value
+
+
+def send_result(result, binary=True):
+    """
+    Send the result dictionary to the host as a length-prefixed JSON frame.
+
+    With binary=True numpy arrays travel as base64-encoded .npy blobs (exact float64, decoded
+    without copying by TalgatSession), otherwise as nested lists.
+    """
+    with phase("encode"):
+        encoded = _encode_value(result, binary)
+    encoded["timings"] = collect_timings()
+    payload = json.dumps(encoded)
+    ECHO(f"{FRAME_MARK} RESULT {_REQUEST_ID} {len(payload)}")
+    ECHO(payload)
+
+
 def cond(X, Y, W, T, D1, D2, TOP, GND):
     if TOP:
         c, a, na = 1., 0., 1.
@@ -44,39 +155,208 @@ def diel1(A, H, D1, D0):
             LINE(A[i][0] + A[i][1], H, A[i + 1][0], H)
 
 
-def CalMat(conf, f0, loss=False, sigma=None):
-    smn_L = SMN_L_OMP(conf)
-    mL = CALCULATE_L(smn_L, conf)
+def resident_configuration(build):
+    """
+    Return the configuration of the current GEOMETRY_KEY, calling build() only if it is not resident.
+
+    At most RESIDENT_SIZE configurations with their SMN matrices are kept, least recently used
+    ones are dropped first. Without GEOMETRY_KEY nothing is kept.
+    """
+    if GEOMETRY_KEY is None:
+        with phase("geometry"):
+            return build()
+    if GEOMETRY_KEY in _RESIDENT:
+        _RESIDENT.move_to_end(GEOMETRY_KEY)
+        _TIMINGS["resident"] = True
+        return _RESIDENT[GEOMETRY_KEY]["conf"]
+    with phase("geometry"):
+        conf = build()
+    _RESIDENT[GEOMETRY_KEY] = {"conf": conf, "smn": {}}
+    while len(_RESIDENT) > RESIDENT_SIZE:
+        _RESIDENT.popitem(last=False)
+    return conf
+
+
+def _smn(conf, kind, solve):
+    """SMN matrix solve(conf), reused if conf is resident and its kind was computed before."""
+    cache = next((entry["smn"] for entry in _RESIDENT.values() if entry["conf"] is conf), {})
+    if kind not in cache:
+        with phase("smn_" + kind):
+            cache[kind] = solve(conf)
+    _count_unknowns(kind, cache[kind])
+    return cache[kind]
+
+
+def matrix_to_array(m, symmetric=True):
+    """
+    Copy a square TALGAT matrix (all CalMat matrices are N x N) to a numpy array.
+
+    PythonClient has no bulk export, so matrices are read element by element with
+    GET_MATRIX_VALUE; for symmetric matrices only the upper triangle is read, halving the calls.
+    """
+    n = GET_MATRIX_ROWS(m)
+    arr = np.zeros((n, n))
+    if symmetric:
+        for i in range(n):
+            for j in range(i, n):
+                arr[i, j] = GET_MATRIX_VALUE(m, i, j)
+        return np.triu(arr) + np.triu(arr, 1).T
+    for i in range(n):
+        for j in range(n):
+            arr[i, j] = GET_MATRIX_VALUE(m, i, j)
+    return arr
+
+
+def _interp_between(fa, fb, Ma, Mb, f, scheme):
+    """Value at f of the converter's piecewise interpolation between (fa, Ma) and (fb, Mb)."""
+    if scheme == 'sqrt':
+        fa, fb, f = np.sqrt(fa), np.sqrt(fb), np.sqrt(f)
+    return Ma + (f - fa) / (fb - fa) * (Mb - Ma)
+
+
+def _relative_error(exact, approx):
+    scale = np.max(np.abs(exact))
+    return np.max(np.abs(exact - approx)) / scale if scale > 0 else 0.0
+
+
+def adaptive_f0(evaluate, f_start, f_stop, tol, interp=('sqrt', 'linear'), max_points=17, initial_points=3):
+    """
+    Choose f0 points by bisection in log-frequency until R(f), G(f) interpolate within tol.
+
+    Every interval is split at its geometric mean; the interval is refined further while the
+    matrices solved there differ from their interpolation between the interval ends by more
+    than tol (max-abs error relative to the largest entry). A 'proportional' G is a single
+    least-squares fit G = k * f over all f0 in the converter, which refining an interval does not
+    improve; the bisection then follows R only and the fit through all solved G is checked at the
+    end, raising ValueError if it misses tol. Reaching max_points while intervals still need
+    refinement raises ValueError with the interpolation error measured there.
+
+    Args:
+        evaluate (callable): freq -> (R, G) as (N, N) arrays, solved with the SMN matrices at hand.
+        f_start, f_stop (float): Frequency range to cover.
+        tol (float): Relative interpolation tolerance.
+        interp (tuple): Converter interpolation schemes of R and G.
+        max_points (int): Upper bound of the number of solves.
+        initial_points (int): Log-spaced starting points.
+
+    Returns:
+        tuple: Sorted f0 (ndarray) and the (R, G) solved at each of them.
+    """
+    samples = {f: evaluate(f) for f in np.geomspace(f_start, f_stop, initial_points)}
+    freqs = sorted(samples)
+    # (fa, fb, error measured when the parent interval was split), inf for the initial intervals
+    intervals = [(fa, fb, np.inf) for fa, fb in zip(freqs[:-1], freqs[1:])]
+    while intervals and len(samples) < max_points:
+        fa, fb, _ = intervals.pop(0)
+        fm = np.sqrt(fa * fb)
+        samples[fm] = evaluate(fm)
+        errors = [_relative_error(samples[fm][k], _interp_between(fa, fb, samples[fa][k], samples[fb][k], fm, interp[k]))
+                  for k in (0, 1) if interp[k] != 'proportional']
+        error = max(errors, default=0.0)
+        if error > tol:
+            intervals += [(fa, fm, error), (fm, fb, error)]
+    if intervals and any(interp[k] != 'proportional' for k in (0, 1)):
+        reached = max(error for _, _, error in intervals)
+        raise ValueError(f"Adaptive f0 reached f0_max_points={max_points} with R/G interpolation error up to "
+                         f"{reached:.2e} > f0_tol={tol:.2e}, raise f0_max_points or f0_tol")
+    freqs = sorted(samples)
+    for k in (0, 1):
+        if interp[k] == 'proportional':
+            # Same fit through the origin as the converter's 'proportional' scheme
+            f = np.array(freqs)
+            M = np.stack([samples[freq][k] for freq in freqs])
+            slope = np.tensordot(f, M, axes=(0, 0)) / np.dot(f, f)
+            error = max(_relative_error(M[i], f[i] * slope) for i in range(len(f)))
+            if error > tol:
+                raise ValueError(f"{'RG'[k]}(f) deviates from the 'proportional' fit by {error:.2e} > f0_tol, "
+                                 f"use 'linear' or 'sqrt' interpolation with adaptive f0")
+    return np.array(freqs), [samples[f] for f in freqs]
+
+
+def solve_options():
+    """
+    CalMat keyword arguments from the optional solver settings of the request.
+
+    The host sends every optional setting with every request, filled in with its default when
+    the caller left it out (talgat.rlgccache.solve_params), so no value of an earlier request
+    survives in the warm session. For adaptive f0, f0_range (the freq_range bounds) and interp
+    (interp_R, interp_G) are sent instead of the post-processing parameters.
+    """
+    f0_tol = globals().get("f0_tol")
+    return {
+        "f0_tol": f0_tol,
+        "f0_range": globals().get("f0_range") if f0_tol is not None else None,
+        "f0_max_points": globals().get("f0_max_points", 17),
+        "interp": tuple(globals().get("interp") or ("linear", "linear")),
+        "rlgc_model": globals().get("rlgc_model", "interpolate"),
+    }
+
+
+def CalMat(conf, f0, loss=False, sigma=None, f0_tol=None, f0_range=None, f0_max_points=17, interp=('sqrt', 'linear'),
+           rlgc_model='interpolate'):
+    """
+    Calculate per-unit-length matrices of a configuration.
+
+    With loss=True and f0_tol set, f0 is ignored and the R/G frequencies are chosen by
+    adaptive_f0 over f0_range (usually the converter's freq_range bounds). The f0 used is
+    returned with the matrices, so the converter interpolates on the same grid.
+
+    With rlgc_model='causal' the converter fits R0 + Rs * sqrt(f) to R and models C(f), G(f)
+    itself, so R is solved at the lowest and highest f0 only, CG once for mC, and mG is zero.
+    """
+    smn_L = _smn(conf, 'L', SMN_L_OMP)
+    with phase("calculate_L"):
+        mL = CALCULATE_L(smn_L, conf)
+    n = GET_MATRIX_ROWS(mL)
     if loss:
-        smn_CG = SMN_CG_OMP(conf)
+        smn_CG = _smn(conf, 'CG', SMN_CG_OMP)
         # mC = CALCULATE_C(SMN_C_OMP(conf), conf)
-        n = GET_MATRIX_ROWS(mL)
-        mR_arr = np.zeros((n, n, len(f0)))
-        mG_arr = np.zeros((n, n, len(f0)))
-        for idx in range(len(f0)):
-            freq = f0[idx]
-            mR = CALCULATE_R(smn_L, conf, freq, sigma)
-            cg = CALCULATE_CG(smn_CG, conf, freq)
-            mC = GET_REAL_MATRIX(cg)
-            mG = GET_IMAG_MATRIX(cg)
-            for i in range(n):
-                for j in range(n):
-                    mR_arr[i, j, idx] = GET_MATRIX_VALUE(mR, i, j)
-                    mG_arr[i, j, idx] = GET_MATRIX_VALUE(mG, i, j)
+        # mC is taken from the CG solve at the highest f0, as before
+        cg_top = {}
+
+        def evaluate(freq):
+            with phase("calculate_R"):
+                mR = CALCULATE_R(smn_L, conf, freq, sigma)
+            with phase("calculate_CG"):
+                cg = CALCULATE_CG(smn_CG, conf, freq)
+            if freq >= cg_top.get("freq", -np.inf):
+                cg_top.update(freq=freq, cg=cg)
+            with phase("extract"):
+                return matrix_to_array(mR), matrix_to_array(GET_IMAG_MATRIX(cg))
+
+        if rlgc_model == 'causal':
+            f0 = sorted({float(np.min(f0)), float(np.max(f0))})
+            mR_list = []
+            for freq in f0:
+                with phase("calculate_R"):
+                    mR = CALCULATE_R(smn_L, conf, freq, sigma)
+                with phase("extract"):
+                    mR_list.append(matrix_to_array(mR))
+            with phase("calculate_CG"):
+                cg_top.update(cg=CALCULATE_CG(smn_CG, conf, f0[-1]))
+            mR_arr = np.stack(mR_list, axis=2)
+            mG_arr = np.zeros_like(mR_arr)
+        else:
+            if f0_tol is not None:
+                f0, solved = adaptive_f0(evaluate, f0_range[0], f0_range[1], f0_tol, interp, f0_max_points)
+            else:
+                solved = [evaluate(freq) for freq in f0]
+            mR_arr = np.stack([R for R, G in solved], axis=2)
+            mG_arr = np.stack([G for R, G in solved], axis=2)
+        mC = GET_REAL_MATRIX(cg_top["cg"])
     else:
-        mC = CALCULATE_C(SMN_C_OMP(conf), conf)
-        n = GET_MATRIX_ROWS(mL)
+        smn_C = _smn(conf, 'C', SMN_C_OMP)
+        with phase("calculate_C"):
+            mC = CALCULATE_C(smn_C, conf)
         mR_arr = np.zeros((n, n, 1))
         mG_arr = np.zeros((n, n, 1))
-    mL_arr = np.zeros((n, n))
-    mC_arr = np.zeros((n, n))
-    for i in range(n):
-        for j in range(n):
-            mL_arr[i, j] = GET_MATRIX_VALUE(mL, i, j)
-            mC_arr[i, j] = GET_MATRIX_VALUE(mC, i, j)
+    with phase("extract"):
+        mL_arr = matrix_to_array(mL)
+        mC_arr = matrix_to_array(mC)
     return {
-        'mL': mL_arr.tolist(),
-        'mC': mC_arr.tolist(),
-        'mR': mR_arr.tolist(),
-        'mG': mG_arr.tolist()
+        'mL': mL_arr,
+        'mC': mC_arr,
+        'mR': mR_arr,
+        'mG': mG_arr,
+        'f0': np.asarray(f0, dtype=float)
     }
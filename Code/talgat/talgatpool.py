@@ -0,0 +1,142 @@
+import queue
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from talgat.talgatsession import TalgatSession, TimingStats
+
+
+class TalgatPool:
+    """Class to run parameter sets concurrently on several warm TALGAT sessions."""
+
+    def __init__(self, exe_path, shared_code: str, size: int = 2):
+        """
+        Start size sessions with shared.py preloaded.
+
+        Args:
+            exe_path: Path to PythonClient.exe or a command line list (see TalgatSession).
+            shared_code (str): Source of shared.py, executed once in every session.
+            size (int): Number of sessions, i.e. solver processes running in parallel.
+        """
+        self.exe_path = exe_path
+        self.shared_code = shared_code
+        self.size = size
+        # Timings of sessions that were restarted
+        self.retired_timings = TimingStats()
+        self.sessions = [self._start_session() for _ in range(size)]
+        self.idle = queue.Queue()
+        for session in self.sessions:
+            self.idle.put(session)
+
+    def _start_session(self):
+        session = TalgatSession(self.exe_path)
+        session.load_shared(self.shared_code)
+        return session
+
+    def _restart(self, session):
+        """Replace a crashed session by a fresh one."""
+        session.close()
+        self.retired_timings.merge(session.timings)
+        new_session = self._start_session()
+        self.sessions[self.sessions.index(session)] = new_session
+        return new_session
+
+    def _run_chunk(self, chunk: list, script_code: str, timeout=None) -> list:
+        """
+        Run parameter sets as one batch on an idle session.
+
+        If the session crashed, it is restarted and the failed points are retried once.
+        """
+        session = self.idle.get()
+        try:
+            results = [None] * len(chunk)
+            pending = list(range(len(chunk)))
+            for attempt in range(2):
+                if not session.is_alive():
+                    print(f"[TalgatPool] session exited with code {session.proc.returncode}, restarting")
+                    session = self._restart(session)
+                if len(pending) == 1:
+                    batch = [session.run_script(chunk[pending[0]], script_code, timeout=timeout)]
+                else:
+                    batch = session.run_batch([chunk[i] for i in pending], script_code, timeout=timeout)
+                for index, result in zip(pending, batch):
+                    results[index] = result
+                if any("error" in result and result["error"].startswith("Timeout") for result in batch):
+                    # The solver is still busy with this request, start over with a fresh process
+                    session = self._restart(session)
+                    break
+                if session.is_alive():
+                    break
+                pending = [i for i in pending if "error" in results[i]]
+            return results
+        finally:
+            self.idle.put(session)
+
+    def run(self, params: dict, script_code: str, timeout=None) -> dict:
+        """Run one parameter set on the next idle session; safe to call from several threads."""
+        return self._run_chunk([params], script_code, timeout)[0]
+
+    def map(self, param_list: list, script_code: str, timeout=None, batch_size: int = 1) -> list:
+        """
+        Run script_code for every parameter set.
+
+        Args:
+            param_list (list): Parameter dictionaries, as passed to TalgatSession.run_script.
+            script_code (str): Structure script, e.g. the contents of M1LIN.py.
+            timeout (float, optional): Seconds allowed per parameter set, default no limit.
+            batch_size (int): Parameter sets sent to a session in one request (TalgatSession.run_batch);
+                larger batches save round trips on small cross-sections.
+
+        Returns:
+            list: Results in the order of param_list; failed runs carry an "error" key.
+        """
+        chunks = [param_list[i:i + batch_size] for i in range(0, len(param_list), batch_size)]
+        with ThreadPoolExecutor(max_workers=self.size) as executor:
+            results = executor.map(lambda chunk: self._run_chunk(chunk, script_code, timeout), chunks)
+            return [result for chunk_results in results for result in chunk_results]
+
+    def timings(self) -> TimingStats:
+        """Solver timings aggregated over all sessions of the pool."""
+        stats = TimingStats()
+        stats.merge(self.retired_timings)
+        for session in self.sessions:
+            stats.merge(session.timings)
+        return stats
+
+    def close(self):
+        for session in self.sessions:
+            session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def main():
+    # Run from the Code directory: python -m talgat.talgatpool
+    import numpy as np
+    from config import STRUCTURES, SUBSTRATES, SIMULATIONS
+
+    exe_path = [sys.executable, "-u", "talgat/talgatstub.py"]
+    shared_code = open("talgat/shared.py", encoding="utf-8").read()
+    script_code = open("talgat/M1LIN.py", encoding="utf-8").read()
+
+    param_list = []
+    for W in np.arange(10.e-6, 50.e-6, 5.e-6):
+        params = STRUCTURES["M1LIN"].copy()
+        params.update(SUBSTRATES["MSUB"])
+        params.update(SIMULATIONS["SPARAM"])
+        params["W"] = W
+        param_list.append(params)
+
+    start = time.time()
+    with TalgatPool(exe_path, shared_code, size=4) as pool:
+        results = pool.map(param_list, script_code)
+        print(pool.timings().report())
+    failed = sum("error" in result for result in results)
+    print(f"Completed {len(results)} simulations ({failed} failed) in {time.time() - start:.2f} sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,60 +1,382 @@
 import subprocess
 import json
-import os
 import itertools
 import numpy as np
-import tempfile
+import atexit
+import base64
+import hashlib
+import io
+import queue
+import threading
+import time
+from talgat.rlgccache import canonical_value, geometry_key, solve_params
+
+FRAME_MARK = "@@TALGAT@@"
+
+
+def _decode_arrays(obj: dict):
+    """json object_hook turning {"__npy__": base64 .npy blob} into a read-only array over the decoded bytes."""
+    if len(obj) != 1 or "__npy__" not in obj:
+        return obj
+    data = base64.b64decode(obj["__npy__"])
+    header = io.BytesIO(data)
+    version = np.lib.format.read_magic(header)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(header)
+    else:
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(header)
+    array = np.frombuffer(data, dtype=dtype, count=int(np.prod(shape)), offset=header.tell())
+    return array.reshape(shape, order="F" if fortran_order else "C")
+
+
+class TimingStats:
+    """Class to aggregate the solver timings returned in result["timings"] over many runs."""
+
+    def __init__(self):
+        self.runs = 0
+        self.phases = {}
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.host_wall = 0.0
+        self.resident_runs = 0
+        self.max_unknowns = {}
+        self.peak_memory = None
+
+    def add(self, timings: dict, host_wall: float = None):
+        """Add the timings of one run; host_wall is the round trip measured by the host."""
+        self.runs += 1
+        for name, entry in timings.get("phases", {}).items():
+            total = self.phases.setdefault(name, {"wall": 0.0, "cpu": 0.0, "calls": 0})
+            for k in total:
+                total[k] += entry[k]
+        self.wall += timings.get("total", {}).get("wall", 0.0)
+        self.cpu += timings.get("total", {}).get("cpu", 0.0)
+        self.host_wall += host_wall or 0.0
+        self.resident_runs += bool(timings.get("resident"))
+        for kind, count in timings.get("unknowns", {}).items():
+            self.max_unknowns[kind] = max(self.max_unknowns.get(kind, 0), count)
+        if timings.get("peak_memory") is not None:
+            self.peak_memory = max(self.peak_memory or 0, timings["peak_memory"])
+
+    def merge(self, other: "TimingStats"):
+        """Add the runs of another TimingStats, e.g. of a session that was restarted."""
+        self.runs += other.runs
+        for name, entry in other.phases.items():
+            total = self.phases.setdefault(name, {"wall": 0.0, "cpu": 0.0, "calls": 0})
+            for k in total:
+                total[k] += entry[k]
+        self.wall += other.wall
+        self.cpu += other.cpu
+        self.host_wall += other.host_wall
+        self.resident_runs += other.resident_runs
+        for kind, count in other.max_unknowns.items():
+            self.max_unknowns[kind] = max(self.max_unknowns.get(kind, 0), count)
+        if other.peak_memory is not None:
+            self.peak_memory = max(self.peak_memory or 0, other.peak_memory)
+
+    def report(self) -> str:
+        """Table of the phases by wall time, with their share of the solver time."""
+        lines = [f"{self.runs} runs ({self.resident_runs} on resident geometry), solver wall {self.wall:.3f} s, "
+                 f"cpu {self.cpu:.3f} s" + (f", host round trip {self.host_wall:.3f} s" if self.host_wall else "")]
+        for name, entry in sorted(self.phases.items(), key=lambda item: -item[1]["wall"]):
+            share = 100 * entry["wall"] / self.wall if self.wall else 0.0
+            lines.append(f"  {name:14s} wall {entry['wall']:9.3f} s ({share:5.1f}%)  cpu {entry['cpu']:9.3f} s  "
+                         f"calls {entry['calls']}")
+        if self.max_unknowns:
+            lines.append("  max unknowns: " + ", ".join(f"{k}={v}" for k, v in sorted(self.max_unknowns.items())))
+        if self.peak_memory is not None:
+            lines.append(f"  peak memory: {self.peak_memory / 2 ** 20:.1f} MB")
+        return "\n".join(lines)
+
 
 class TalgatSession:
-    def __init__(self, exe_path: str):
+    """
+    Class to drive one TALGAT PythonClient process.
+
+    Every request is sent as a single stdin line that executes the base64-encoded script in
+    memory, so no temporary files are written. The response is framed by sentinel lines:
+
+        @@TALGAT@@ BEGIN <id>
+        @@TALGAT@@ RESULT <id> <nbytes>   followed by the JSON payload line (shared.send_result),
+                                          arrays inside it as base64 .npy blobs
+        @@TALGAT@@ ERROR <id> <message>   if the script raised
+        @@TALGAT@@ END <id>
+
+    Any other output is solver log and is printed only with echo=True. Frames of other request
+    ids (e.g. late output of a request that timed out) are discarded.
+    """
+
+    def __init__(self, exe_path, echo: bool = False, resident: bool = True):
+        """
+        Start a TALGAT PythonClient process.
+
+        exe_path may be a path to the executable or a full command line list, e.g.
+        [sys.executable, "-u", "talgat/talgatstub.py"] for the local stand-in.
+        With resident=True every request carries a GEOMETRY_KEY, so that shared.py keeps the
+        configuration and its SMN matrices for later requests on the same cross-section.
+        """
+        self.echo = echo
+        self.resident = resident
+        self.request_id = 0
+        # Solver timings of every successful run, see TimingStats
+        self.timings = TimingStats()
+        self.lock = threading.RLock()
         self.proc = subprocess.Popen(
-            [exe_path],
+            [exe_path] if isinstance(exe_path, str) else list(exe_path),
             stdin=subprocess.PIPE,
             stdout=subprocess.PIPE,
             stderr=subprocess.STDOUT,
             text=True,
             bufsize=1
         )
+        # stdout is read by a thread so that requests can time out instead of blocking in readline
+        self.lines = queue.Queue()
+        self.reader = threading.Thread(target=self._read_stdout, daemon=True)
+        self.reader.start()
+
+    def _read_stdout(self):
+        for line in self.proc.stdout:
+            self.lines.put(line.rstrip("\r\n"))
+        self.lines.put(None)
+
+    @staticmethod
+    def _encode(code: str) -> str:
+        """Single line executing code without touching the file system."""
+        encoded = base64.b64encode(code.encode("utf-8")).decode("ascii")
+        return f"exec(__import__('base64').b64decode('{encoded}').decode('utf-8'))\n"
+
+    @staticmethod
+    def _new_response():
+        return {"payload": None, "error": None, "output": []}
 
-    def run_script(self, param_dict: dict, main_script: str) -> dict:
+    def _stream(self, code: str, timeout=None, echo=None):
+        """
+        Execute code in the session and yield its framed responses as they complete.
 
+        Yields (sub_id, response) at every END frame of this request, where response is
+        {"payload": JSON string or None, "error": message or None, "output": log lines}.
+        sub_id is the batch point index for frames with id "<request id>:<index>" and "" for
+        the request itself, which always comes last, also on timeout or process exit.
+        timeout is measured from the request start or the last completed point. Requests from
+        several threads are served one after another.
+        """
+        # One request at a time, the output of concurrent requests would interleave
+        with self.lock:
+            echo = self.echo if echo is None else echo
+            self.request_id += 1
+            rid = str(self.request_id)
+            wrapper = f"""
+_REQUEST_ID = {rid}
+ECHO("{FRAME_MARK} BEGIN {rid}")
+try:
+    exec(__import__('base64').b64decode('{base64.b64encode(code.encode("utf-8")).decode("ascii")}').decode('utf-8'))
+except Exception as _talgat_error:
+    ECHO("{FRAME_MARK} ERROR {rid} " + " ".join(repr(_talgat_error).split()))
+ECHO("{FRAME_MARK} END {rid}")
+"""
+            responses = {}
+            open_ids = []
+            try:
+                self.proc.stdin.write(self._encode(wrapper))
+                self.proc.stdin.flush()
+            except OSError as e:
+                yield "", dict(self._new_response(), error=f"Can't send request to TALGAT: {e}")
+                return
 
-        param_code = "\n".join(f"{k} = {repr(v)}" for k, v in param_dict.items())
+            deadline = None if timeout is None else time.monotonic() + timeout
+            expected = None
+            while True:
+                try:
+                    wait = None if deadline is None else max(deadline - time.monotonic(), 0.0)
+                    line = self.lines.get(timeout=wait)
+                except queue.Empty:
+                    yield "", dict(responses.get("", self._new_response()), error=f"Timeout after {timeout} s")
+                    return
+                if line is None:
+                    self.lines.put(None)
+                    yield "", dict(responses.get("", self._new_response()),
+                                   error=f"TALGAT process exited with code {self.proc.wait()}")
+                    return
+
+                if expected is not None:
+                    response, expected_bytes = expected
+                    if len(line) != expected_bytes:
+                        response["error"] = f"Result frame length mismatch: expected {expected_bytes}, got {len(line)}"
+                    else:
+                        response["payload"] = line
+                    expected = None
+                    continue
+
+                if line.startswith(FRAME_MARK):
+                    fields = line.split(" ", 3)
+                    kind, (request, _, sub_id) = fields[1], fields[2].partition(":")
+                    if request != rid:
+                        continue
+                    if kind == "BEGIN":
+                        responses[sub_id] = self._new_response()
+                        open_ids.append(sub_id)
+                        continue
+                    response = responses.setdefault(sub_id, self._new_response())
+                    if kind == "RESULT":
+                        expected = (response, int(fields[3]))
+                    elif kind == "ERROR":
+                        response["error"] = fields[3] if len(fields) > 3 else "Unknown error"
+                    elif kind == "END":
+                        if sub_id in open_ids:
+                            open_ids.remove(sub_id)
+                        yield sub_id, responses.pop(sub_id)
+                        if sub_id == "":
+                            return
+                        if deadline is not None:
+                            deadline = time.monotonic() + timeout
+                elif open_ids:
+                    responses[open_ids[-1]]["output"].append(line)
+                    if echo:
+                        print("[TALGAT]", line)
+
+    def _request(self, code: str, timeout=None, echo=None) -> dict:
+        """Execute code in the session and return its framed response, see _stream."""
+        return dict(self._stream(code, timeout, echo))[""]
+
+    def load_shared(self, shared_code: str, timeout=None):
+        """Execute shared.py code in the session."""
+        response = self._request(shared_code, timeout)
+        if response["error"] is not None:
+            raise RuntimeError(f"Can't load shared code into TALGAT: {response['error']}")
+
+    def is_alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def _param_code(self, param_dict: dict, main_script: str) -> str:
+        # Always set GEOMETRY_KEY, so that a key left over from the previous request is never reused
+        key = geometry_key(main_script, param_dict) if self.resident else None
+        # Only the solve parameters are sent (freq_range, vf_params, ... stay on the host), as plain
+        # lists and floats: repr of large numpy arrays is not valid Python under NumPy 2
+        solve = {**solve_params(param_dict), "GEOMETRY_KEY": key}
+        param_code = "\n".join(f"{k} = {repr(canonical_value(v))}" for k, v in solve.items())
+        return "reset_timings() if 'reset_timings' in globals() else None\n" + param_code
+
+    def _record_timings(self, result: dict, host_wall: float):
+        if "result" in result and "timings" in result["result"]:
+            self.timings.add(result["result"]["timings"], host_wall)
+
+    @staticmethod
+    def _to_result(param_dict: dict, response: dict) -> dict:
+        if response["error"] is None and response["payload"] is None:
+            response["error"] = "No result frame, does the script call send_result?"
+        if response["error"] is not None:
+            return {"params": param_dict, "error": response["error"], "output": response["output"]}
+        return {"params": param_dict, "result": json.loads(response["payload"], object_hook=_decode_arrays)}
+
+    def run_script(self, param_dict: dict, main_script: str, timeout=None, echo=None) -> dict:
+        """
+        Run a structure script with the given parameters.
+
+        Args:
+            param_dict (dict): Parameters, defined as variables before main_script runs.
+            main_script (str): Structure script that ends with send_result(result).
+            timeout (float, optional): Seconds to wait for the response, default no limit.
+            echo (bool, optional): Print solver output, default self.echo.
+
+        Returns:
+            dict: {"params", "result"} on success, {"params", "error", "output"} otherwise.
+        """
         full_script = f"""
-{param_code}
+{self._param_code(param_dict, main_script)}
 
 {main_script}
     """
+        start = time.perf_counter()
+        result = self._to_result(param_dict, self._request(full_script, timeout, echo))
+        self._record_timings(result, time.perf_counter() - start)
+        return result
 
-        with tempfile.NamedTemporaryFile("w", delete=False, suffix=".py", encoding="utf-8") as tmp:
-            tmp.write(full_script)
-            tmp_path = tmp.name
+    def iter_batch(self, param_list: list, main_script: str, timeout=None, echo=None):
+        """
+        Run a structure script for many parameter sets in one request.
 
-        self.proc.stdin.write(f"exec(open(r'''{tmp_path}''').read())\n")
-        self.proc.stdin.flush()
+        The solver loops over the parameter sets itself and frames every point separately, so
+        results are yielded as they arrive. A failing point does not stop the batch; if the
+        request ends early (timeout, process exit), the remaining points get its error.
 
-        output_lines = []
-        while True:
-            line = self.proc.stdout.readline()
-            if not line:
-                break
-            print("[TALGAT]", line.strip())
-            output_lines.append(line.strip())
-            if line.strip().startswith("{") and line.strip().endswith("}"):
-                break
+        Args:
+            param_list (list): Parameter dictionaries, as for run_script.
+            main_script (str): Structure script that ends with send_result(result).
+            timeout (float, optional): Seconds allowed per point, default no limit.
+            echo (bool, optional): Print solver output, default self.echo.
 
-        os.remove(tmp_path)
+        Yields:
+            dict: Result of each parameter set in the order of param_list, as from run_script.
+        """
+        points = [self._param_code(params, main_script) for params in param_list]
+        batch_script = f"""
+_BATCH_SCRIPT = compile({main_script!r}, "<structure>", "exec")
+_BATCH_ID = _REQUEST_ID
+for _BATCH_INDEX, _BATCH_PARAMS in enumerate({points!r}):
+    _REQUEST_ID = str(_BATCH_ID) + ":" + str(_BATCH_INDEX)
+    ECHO("{FRAME_MARK} BEGIN " + _REQUEST_ID)
+    try:
+        exec(_BATCH_PARAMS)
+        exec(_BATCH_SCRIPT)
+    except Exception as _talgat_error:
+        ECHO("{FRAME_MARK} ERROR " + _REQUEST_ID + " " + " ".join(repr(_talgat_error).split()))
+    ECHO("{FRAME_MARK} END " + _REQUEST_ID)
+_REQUEST_ID = _BATCH_ID
+"""
+        done = {}
+        next_index = 0
+        start = time.perf_counter()
+        for sub_id, response in self._stream(batch_script, timeout, echo):
+            if sub_id == "":
+                if response["error"] is None:
+                    response["error"] = "Batch ended before this point"
+                for index in range(next_index, len(param_list)):
+                    result = done.pop(index, None)
+                    yield result if result is not None else self._to_result(param_list[index], dict(response))
+                return
+            done[int(sub_id)] = self._to_result(param_list[int(sub_id)], response)
+            self._record_timings(done[int(sub_id)], time.perf_counter() - start)
+            start = time.perf_counter()
+            while next_index in done:
+                yield done.pop(next_index)
+                next_index += 1
 
-        json_line = next((l for l in output_lines if l.startswith("{")), None)
-        if json_line:
-            return {"params": param_dict, "result": json.loads(json_line)}
-        else:
-            return {"params": param_dict, "error": "No JSON output"}
+    def run_batch(self, param_list: list, main_script: str, timeout=None, echo=None) -> list:
+        """List of iter_batch results, in the order of param_list."""
+        return list(self.iter_batch(param_list, main_script, timeout, echo))
 
     def close(self):
         self.proc.terminate()
         self.proc.wait()
 
+
+class SessionManager:
+    """Class to keep warm TALGAT sessions alive across simulations, one per executable and shared code."""
+
+    def __init__(self):
+        self.sessions = {}
+        atexit.register(self.close_all)
+
+    def get(self, exe_path, shared_code: str) -> TalgatSession:
+        """Return a running session with shared_code loaded, starting or restarting it if needed."""
+        key = (exe_path if isinstance(exe_path, str) else tuple(exe_path),
+               hashlib.sha1(shared_code.encode("utf-8")).hexdigest())
+        session = self.sessions.get(key)
+        if session is None or not session.is_alive():
+            session = TalgatSession(exe_path)
+            session.load_shared(shared_code)
+            self.sessions[key] = session
+        return session
+
+    def close_all(self):
+        for session in self.sessions.values():
+            session.close()
+        self.sessions.clear()
+
+
+session_manager = SessionManager()
+
+
 def main():
     # from shared import CalMat  # если потребуется
     exe_path = r"C:\Program Files\TALGAT 2021\PythonClient.exe"
@@ -88,13 +410,13 @@ def main():
         for W, S in itertools.product(W_values, S_values)
     ]
 
-    import time
     start = time.time()
     session = TalgatSession(exe_path)
+    session.load_shared(shared_code)
     results = []
     for params in param_combinations:
         try:
-            result = session.run_script(params, shared_code, script_code)
+            result = session.run_script(params, script_code)
             results.append(result)
         except Exception as e:
             results.append({"params": params, "error": str(e)})
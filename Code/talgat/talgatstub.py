@@ -0,0 +1,288 @@
+"""
+Local stand-in for TALGAT PythonClient.exe.
+
+Speaks the same stdin/stdout protocol (one Python statement per stdin line, output via ECHO)
+and implements the TALGAT commands used by shared.py and the structure scripts with rough
+closed-form microstrip formulas. Intended for running TalgatSession and TalgatPool on
+machines without TALGAT:
+
+    TalgatSession([sys.executable, "-u", "talgat/talgatstub.py"])
+
+Set TALGAT_STUB_DELAY (seconds) to emulate the cost of the MoM matrix fill.
+"""
+import os
+import sys
+import time
+import traceback
+import numpy as np
+
+MU0 = 4e-7 * np.pi
+C0 = 299792458.0
+SIGMA_CU = 5.8e7
+DELAY = float(os.environ.get("TALGAT_STUB_DELAY", "0"))
+
+
+class Matrix:
+    """TALGAT matrix handle."""
+
+    def __init__(self, values):
+        self.values = np.asarray(values)
+
+
+class Configuration:
+    """2D cross-section: conductors as bounding boxes plus the substrate parameters."""
+
+    def __init__(self, conductors, er, tan_delta, seg_cond, seg_diel, dielectric_length=0.0):
+        self.conductors = conductors
+        self.dielectric_length = dielectric_length
+        self.er = er
+        self.tan_delta = tan_delta
+        self.seg_cond = seg_cond
+        self.seg_diel = seg_diel
+
+
+class _Geometry:
+    """Geometry being drawn by CONDUCTOR/DIELECTRIC/LINE/LINETO calls."""
+
+    def __init__(self):
+        self.objects = []
+        self.current = None
+        self.er_plus = 1.0
+        self.tan_delta_plus = 0.0
+        self.er = 1.0
+        self.tan_delta = 0.0
+        self.seg_cond = None
+        self.seg_diel = None
+
+    def start(self, kind):
+        self.current = {"kind": kind, "points": []}
+        self.objects.append(self.current)
+
+    def add(self, x, y):
+        self.current["points"].append((x, y))
+        if self.current["kind"] == "dielectric" and self.er_plus > self.er:
+            self.er, self.tan_delta = self.er_plus, self.tan_delta_plus
+
+
+_geometry = _Geometry()
+
+
+def _new_geometry():
+    global _geometry
+    seg_cond, seg_diel = _geometry.seg_cond, _geometry.seg_diel
+    _geometry = _Geometry()
+    _geometry.seg_cond, _geometry.seg_diel = seg_cond, seg_diel
+
+
+def _delay():
+    if DELAY:
+        time.sleep(DELAY)
+
+
+def register_talgat_commands():
+    pass
+
+
+def INCLUDE(name):
+    pass
+
+
+def ECHO(*args):
+    print(*args, flush=True)
+
+
+def SET_INFINITE_GROUND(flag):
+    pass
+
+
+def SET_AUTO_SEGMENT_LENGTH_CONDUCTOR(length):
+    _geometry.seg_cond = length
+
+
+def SET_AUTO_SEGMENT_LENGTH_DIELECTRIC(length):
+    _geometry.seg_diel = length
+
+
+def CONDUCTOR():
+    _geometry.start("conductor")
+
+
+def CONDUCTOR_GROUNDED():
+    _geometry.start("ground")
+
+
+def DIELECTRIC():
+    _geometry.start("dielectric")
+
+
+def SET_ER_PLUS(er):
+    _geometry.er_plus = er
+
+
+def SET_MU_PLUS(mu):
+    pass
+
+
+def SET_TAN_DELTA_PLUS(td):
+    _geometry.tan_delta_plus = td
+
+
+def SET_ER_MINUS(er):
+    pass
+
+
+def SET_MU_MINUS(mu):
+    pass
+
+
+def SET_TAN_DELTA_MINUS(td):
+    pass
+
+
+def LINE(x1, y1, x2, y2):
+    _geometry.add(x1, y1)
+    _geometry.add(x2, y2)
+
+
+def LINETO(x, y):
+    _geometry.add(x, y)
+
+
+def GET_CONFIGURATION_2D():
+    conductors = []
+    dielectric_length = 0.0
+    for obj in _geometry.objects:
+        if obj["kind"] == "dielectric":
+            points = np.array(obj["points"]).reshape(-1, 2, 2)
+            dielectric_length += float(np.sum(np.hypot(*(points[:, 1] - points[:, 0]).T)))
+        # Objects left without points by a script that failed while drawing are dropped
+        if obj["kind"] == "conductor" and obj["points"]:
+            xs, ys = zip(*obj["points"])
+            conductors.append((min(xs), max(xs), min(ys), max(ys)))
+    conf = Configuration(conductors, _geometry.er, _geometry.tan_delta, _geometry.seg_cond, _geometry.seg_diel,
+                         dielectric_length)
+    _new_geometry()
+    return conf
+
+
+def _inductance(conf):
+    """
+    Per-unit-length inductance of conductors over an infinite ground (Wheeler, images).
+
+    A discretization error of second order in segment length / width is added, so that the
+    results depend on SET_AUTO_SEGMENT_LENGTH_* like a MoM solve does.
+    """
+    n = len(conf.conductors)
+    L = np.zeros((n, n))
+    for i, (x1, x2, y1, y2) in enumerate(conf.conductors):
+        w, h = x2 - x1, y1
+        if w / h <= 1:
+            z0_air = 60 * np.log(8 * h / w + w / (4 * h))
+        else:
+            z0_air = 120 * np.pi / (w / h + 1.393 + 0.667 * np.log(w / h + 1.444))
+        L[i, i] = z0_air / C0 * (1 + _segment_error(conf.seg_cond, w))
+        for j, (u1, u2, v1, v2) in enumerate(conf.conductors):
+            if i != j:
+                d = abs((x1 + x2) / 2 - (u1 + u2) / 2)
+                L[i, j] = MU0 / (4 * np.pi) * np.log(1 + 4 * h * v1 / d ** 2)
+    return L
+
+
+def _segment_error(segment, width):
+    return 0.0 if segment is None else 0.5 * (segment / width) ** 2
+
+
+def _eps_eff(conf):
+    ws = np.array([c[1] - c[0] for c in conf.conductors])
+    hs = np.array([c[2] for c in conf.conductors])
+    er = conf.er
+    eps_eff = np.mean((er + 1) / 2 + (er - 1) / 2 / np.sqrt(1 + 12 * hs / ws))
+    return float(eps_eff * (1 - _segment_error(conf.seg_diel, ws.min())))
+
+
+def _capacitance(conf):
+    return _eps_eff(conf) / C0 ** 2 * np.linalg.inv(_inductance(conf))
+
+
+def _unknowns(conf, dielectric):
+    """Number of segments, i.e. MoM unknowns, of the conductors and optionally the dielectric boundaries."""
+    if conf.seg_cond is None:
+        return len(conf.conductors)
+    count = sum(int(np.ceil(2 * ((x2 - x1) + (y2 - y1)) / conf.seg_cond)) for x1, x2, y1, y2 in conf.conductors)
+    if dielectric and conf.seg_diel:
+        count += int(np.ceil(conf.dielectric_length / conf.seg_diel))
+    return count
+
+
+def SMN_L_OMP(conf):
+    _delay()
+    return Matrix(np.zeros((_unknowns(conf, False),) * 2))
+
+
+def SMN_C_OMP(conf):
+    _delay()
+    return Matrix(np.zeros((_unknowns(conf, True),) * 2))
+
+
+def SMN_CG_OMP(conf):
+    _delay()
+    return Matrix(np.zeros((_unknowns(conf, True),) * 2, dtype=complex))
+
+
+def CALCULATE_L(smn, conf):
+    return Matrix(_inductance(conf))
+
+
+def CALCULATE_C(smn, conf):
+    return Matrix(_capacitance(conf))
+
+
+def CALCULATE_R(smn, conf, freq, sigma=None):
+    sigma = SIGMA_CU if sigma is None else sigma
+    ws = np.array([c[1] - c[0] for c in conf.conductors])
+    rs = np.sqrt(np.pi * freq * MU0 / sigma)
+    return Matrix(np.diag(rs / ws) + rs / (10 * ws.max()))
+
+
+def CALCULATE_CG(smn, conf, freq):
+    C = _capacitance(conf)
+    eps_eff = _eps_eff(conf)
+    er = conf.er
+    filling = er / eps_eff * (eps_eff - 1) / (er - 1) if er > 1 else 0.0
+    G = 2 * np.pi * freq * conf.tan_delta * filling * C
+    return Matrix(C + 1j * G)
+
+
+def GET_REAL_MATRIX(m):
+    return Matrix(m.values.real)
+
+
+def GET_IMAG_MATRIX(m):
+    return Matrix(m.values.imag)
+
+
+def GET_MATRIX_ROWS(m):
+    return m.values.shape[0]
+
+
+def GET_MATRIX_VALUE(m, i, j):
+    return float(m.values[i, j])
+
+
+def main():
+    namespace = {name: value for name, value in globals().items()
+                 if callable(value) and (name.isupper() or name == "register_talgat_commands")}
+    namespace["__builtins__"] = __builtins__
+    while True:
+        line = sys.stdin.readline()
+        if not line:
+            break
+        try:
+            exec(line, namespace)
+        except Exception:
+            traceback.print_exc(file=sys.stdout)
+            sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -145,12 +145,13 @@ class SParamProcessor:
         Initialize with S-parameters and frequency data.
 
         Args:
-            s_params (ndarray): S-parameter matrix of shape (n_ports, n_ports, n_freqs).
+            s_params (ndarray or rlcg2s.compact.PackedSymmetric): S-parameter matrix of shape (n_freqs, n_ports, n_ports).
+                Packed S-parameters are unpacked only when the scikit-rf Network is built.
             freqs (ndarray): Frequency points in Hz.
             z0 (float or ndarray): Reference impedance(s), default 50.0 Ohms.
             name (str): Name for the network, default 'network'.
         """
-        self.s_params = np.asarray(s_params)
+        self.s_params = s_params if hasattr(s_params, 'unpack') else np.asarray(s_params)
         self.freqs = np.asarray(freqs)
         self.z0 = z0 if np.isscalar(z0) else np.asarray(z0)
         self.name = name
@@ -159,9 +160,9 @@ class SParamProcessor:
         self.subcircuits = {}
 
         # Validate shapes
-        if self.s_params.ndim != 3:
+        if len(self.s_params.shape) != 3:
             raise ValueError(f"S-parameters must be 3D, got shape {self.s_params.shape}")
-        n_ports1, n_ports2, n_freqs = self.s_params.shape
+        n_freqs, n_ports1, n_ports2 = self.s_params.shape
         if n_ports1 != n_ports2:
             raise ValueError(f"S-parameter matrix must be square in port dimensions, got {n_ports1}x{n_ports2}")
         if len(self.freqs) != n_freqs:
@@ -169,16 +170,17 @@ class SParamProcessor:
                 f"Frequency array length {len(self.freqs)} does not match s_params freq dimension {n_freqs}")
 
         # Create scikit-rf Network
-        self._create_network()
+        if not hasattr(self.s_params, 'unpack'):
+            self._create_network()
 
     def _create_network(self):
         """Create a scikit-rf Network object from S-parameters."""
-        # Transpose s_params to (n_freqs, n_ports, n_ports) for scikit-rf
-        s_params_transposed = np.transpose(self.s_params, (2, 0, 1))
+        # Packed S-parameters (rlcg2s.compact.PackedSymmetric) are unpacked only here
+        s_params = self.s_params.unpack() if hasattr(self.s_params, 'unpack') else self.s_params
         # Convert frequencies to GHz as scikit-rf expects
         freqs_ghz = self.freqs / 1e9
         # Ensure z0 is an array matching number of ports
-        n_ports = self.s_params.shape[0]
+        n_ports = self.s_params.shape[1]
         if np.isscalar(self.z0):
             z0_array = np.full(n_ports, self.z0)
         else:
@@ -186,7 +188,7 @@ class SParamProcessor:
             if len(z0_array) != n_ports:
                 raise ValueError(f"z0 length {len(z0_array)} does not match number of ports {n_ports}")
 
-        self.network = skrf.Network(frequency=freqs_ghz, s=s_params_transposed, z0=z0_array, name=self.name)
+        self.network = skrf.Network(frequency=freqs_ghz, s=s_params, z0=z0_array, name=self.name)
 
     def perform_vector_fitting(self, **vf_params):
         """
@@ -195,7 +197,7 @@ class SParamProcessor:
         Args:
             **vf_params: Parameters for skrf.VectorFitting.auto_fit (e.g., n_poles_init_real, target_error).
         """
-        self.vf = skrf.VectorFitting(self.network)
+        self.vf = skrf.VectorFitting(self.get_network())
         self.vf.auto_fit(**vf_params)
 
     def generate_subcircuit(self, fitted_model_name='s_equivalent', create_reference_pins=False):
@@ -217,6 +219,8 @@ class SParamProcessor:
 
     def get_network(self):
         """Return the scikit-rf Network object."""
+        if self.network is None:
+            self._create_network()
         return self.network
 
     def get_subcircuits(self):